@@ -11,6 +11,7 @@ from fastapi.responses import JSONResponse
 
 from .config import settings
 from ..models.database import Base, engine, init_app
+from ..notifications.manager import shutdown_notifications
 
 # Import routers from modular components
 from .auth.routes import router as auth_router
@@ -97,7 +98,9 @@ def startup_db_client():
     logger.info("Database initialized")
 
 @app.on_event("shutdown")
-def shutdown_db_client():
+async def shutdown_db_client():
+    # Let background notification deliveries finish before the loop goes away
+    await shutdown_notifications()
     logger.info("Database connection closed")
 
 # Initialize Flask-Migrate with the app
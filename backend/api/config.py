@@ -30,6 +30,7 @@ class Settings(BaseSettings):
     email_username: str = os.environ.get("EMAIL_USERNAME", "")
     email_password: str = os.environ.get("EMAIL_PASSWORD", "")
     email_from: str = os.environ.get("EMAIL_FROM", "noreply@airalert.com")
+    smtp_pool_size: int = int(os.environ.get("SMTP_POOL_SIZE", 4))  # SMTP connections per event loop
     
     # Web push settings
     vapid_public_key: str = os.environ.get("VAPID_PUBLIC_KEY", "")
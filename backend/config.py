@@ -3,11 +3,28 @@ Configuration module for AirAlert.
 Centralizes application configuration from environment variables and defaults.
 """
 import os
+import pathlib
+import functools
 from typing import Dict, Any
 from dotenv import load_dotenv
 
+@functools.cache
+def load_environment() -> str:
+    """
+    Load environment variables from the env file, once per process.
+    
+    Prefers .env.fixed when it exists, otherwise .env; variables that are
+    already set are not overridden. Later calls are no-ops.
+    
+    Returns:
+        Path of the env file that was loaded
+    """
+    dotenv_path = ".env.fixed" if pathlib.Path(".env.fixed").exists() else ".env"
+    load_dotenv(dotenv_path=dotenv_path, override=False)
+    return dotenv_path
+
 # Load environment variables
-load_dotenv()
+load_environment()
 
 class Config:
     """Configuration manager for AirAlert."""
@@ -125,3 +142,15 @@ class Config:
 
 # Create a global instance for easy imports
 config = Config()
+
+@functools.cache
+def resolved_database_url() -> str:
+    """
+    Get DATABASE_URL with any backslash escapes (e.g. "\\x..." from a
+    mis-encoded .env file) decoded. Resolved once per process.
+    
+    Returns:
+        Database URL, defaulting to the local SQLite database
+    """
+    raw = os.getenv("DATABASE_URL", "sqlite:///./airalert.db")
+    return raw.encode().decode("unicode_escape") if "\\" in raw else raw
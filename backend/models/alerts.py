@@ -1,7 +1,7 @@
 """
 Alert and notification models for the AirAlert system.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, Index, text
 from sqlalchemy.orm import relationship
 from geoalchemy2 import Geometry
 from datetime import datetime
@@ -49,6 +49,8 @@ class Notification(Base):
     message = Column(Text)  # Personalized message generated from template
     delivery_channel = Column(String)  # e.g., 'email', 'sms', 'app', etc.
     sent_at = Column(DateTime)  # When the notification was sent
+    status = Column(String, nullable=False, default="pending", server_default="pending")  # 'pending', 'sending', 'sent', 'duplicate', 'below_threshold'
+    claimed_at = Column(DateTime)  # When a background delivery claimed the row ('sending')
     received_at = Column(DateTime)  # When the notification was received
     read_at = Column(DateTime)  # When the notification was read by user
     location_type = Column(String)  # 'home' or 'work' location affected
@@ -57,6 +59,34 @@ class Notification(Base):
     alert = relationship("Alert", back_populates="notifications")
     user = relationship("User", back_populates="notifications")
     
+    # Partial indexes so polling for pending notifications (overall and per
+    # alert) is a bounded index scan; the overall one is in the dispatcher's
+    # (user_id, id) order so pending rows stream without a sort. Suppressed
+    # rows are never sent, so they are excluded by status rather than sent_at.
+    __table_args__ = (
+        Index(
+            "ix_notifications_pending",
+            "user_id",
+            "id",
+            postgresql_where=text("sent_at IS NULL AND status = 'pending'"),
+            sqlite_where=text("sent_at IS NULL AND status = 'pending'"),
+        ),
+        Index(
+            "idx_notifications_alert_pending",
+            "alert_id",
+            "user_id",
+            postgresql_where=text("sent_at IS NULL AND status = 'pending'"),
+            sqlite_where=text("sent_at IS NULL AND status = 'pending'"),
+        ),
+        # Claimed rows, so the stale-claim sweep doesn't scan the table
+        Index(
+            "ix_notifications_claimed",
+            "claimed_at",
+            postgresql_where=text("status = 'sending'"),
+            sqlite_where=text("status = 'sending'"),
+        ),
+    )
+    
     def __repr__(self):
         return f"<Notification(id={self.id}, alert={self.alert_id}, user={self.user_id})>"
 
@@ -7,26 +7,20 @@ from sqlalchemy import create_engine, event, Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 # Remove async imports
-from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
 
-# Load environment variables
-load_dotenv()
+from ..config import load_environment, resolved_database_url
 
-# Get database URL from environment or use a default SQLite database
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./airalert.db")  # Changed to sync SQLite
+# Load environment variables (already done by backend.config; this is a no-op)
+load_environment()
 
-# Handle potential encoding/escaping issues
-if "\\x" in DATABASE_URL:
-    try:
-        print(f"Found escaped characters in DATABASE_URL: {repr(DATABASE_URL)}")
-        # Try to decode any escaped hex characters
-        DATABASE_URL = bytes(DATABASE_URL, 'utf-8').decode('unicode_escape')
-        print(f"Decoded DATABASE_URL: {repr(DATABASE_URL)}")
-    except Exception as e:
-        print(f"Error decoding DATABASE_URL: {e}")
-        # Use hardcoded default as fallback
-        DATABASE_URL = "sqlite:///./airalert.db"
+# Get database URL from environment (with any escapes decoded) or use a default SQLite database
+try:
+    DATABASE_URL = resolved_database_url()
+except Exception as e:
+    print(f"Error decoding DATABASE_URL: {e}")
+    # Use hardcoded default as fallback
+    DATABASE_URL = "sqlite:///./airalert.db"
 
 # Remove any quotes that might be surrounding the URL
 if DATABASE_URL.startswith('"') and DATABASE_URL.endswith('"'):
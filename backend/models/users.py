@@ -1,7 +1,7 @@
 """
 User models for the AirAlert system.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Enum, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from geoalchemy2 import Geometry
 from datetime import datetime
@@ -144,6 +144,16 @@ class WebPushSubscription(Base):
     # Relationship
     user = relationship("User")
     
+    # Covers the active-subscriptions-by-user lookups made for every push batch
+    __table_args__ = (
+        Index(
+            "idx_wps_user_active",
+            "user_id",
+            "is_active",
+            postgresql_where=text("is_active"),
+        ),
+    )
+    
     def __repr__(self):
         return f"<WebPushSubscription(id={self.id}, user={self.user_id})>"
 
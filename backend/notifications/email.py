@@ -12,21 +12,133 @@ from typing import Dict, Any, List, Optional, Tuple
 
 from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
+from jinja2 import Template
 
 from .base import NotificationSender
 from ..models.alerts import Notification
 from ..models.users import User
 
+_ALERT_EMAIL_TEMPLATE = """
+        <html>
+        <head>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background-color: #3498db; color: white; padding: 10px; text-align: center; border-radius: 5px 5px 0 0; }
+                .content { padding: 20px; background-color: #f9f9f9; }
+                .footer { font-size: 12px; text-align: center; margin-top: 20px; color: #777; padding: 10px; background-color: #f1f1f1; border-radius: 0 0 5px 5px; }
+                .alert-level { font-weight: bold; }
+                .alert-details { background-color: #eaf2f8; padding: 15px; border-radius: 5px; margin: 15px 0; }
+                .health-advice { background-color: #e8f8f5; padding: 15px; border-radius: 5px; margin: 15px 0; border-left: 4px solid #3498db; }
+                .health-advice h3 { margin-top: 0; color: #16a085; }
+                .health-advice ul { padding-left: 20px; }
+                .value { font-weight: bold; color: {{ severity_color }}; }
+                .button { display: inline-block; background-color: #3498db; color: white; text-decoration: none; padding: 10px 20px; border-radius: 5px; margin-top: 15px; }
+                .aqi-scale { display: flex; margin: 15px 0; border-radius: 5px; overflow: hidden; }
+                .aqi-segment { height: 10px; flex-grow: 1; }
+                .aqi-good { background-color: #00e400; }
+                .aqi-moderate { background-color: #ffff00; }
+                .aqi-unhealthy-sensitive { background-color: #ff7e00; }
+                .aqi-unhealthy { background-color: #ff0000; }
+                .aqi-very-unhealthy { background-color: #8f3f97; }
+                .aqi-hazardous { background-color: #7e0023; }
+                .aqi-marker { width: 0; height: 0; border-left: 10px solid transparent; border-right: 10px solid transparent; border-bottom: 10px solid black; margin-left: calc({{ marker_offset }}% - 10px); }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h2>{{ severity_emoji }} Air Quality Alert</h2>
+                </div>
+                <div class="content">
+                    <p>Hello {{ user_name }},</p>
+                    
+                    <p>{{ message }}</p>
+                    
+                    <div class="alert-details">
+                        <h3>Alert Details:</h3>
+                        <ul>
+                            <li>Pollutant: <span class="value">{{ pollutant }}</span></li>
+                            <li>Current Value: <span class="value">{{ current_value }}</span> (Threshold: {{ threshold }})</li>
+                            <li>Status: <span class="value">{{ severity_text }}</span></li>
+                            <li>Location: Your {{ location_type }} area</li>
+                            <li>Alert Time: {{ alert_time }}</li>
+                        </ul>
+                        
+                        <div class="aqi-scale">
+                            <div class="aqi-segment aqi-good"></div>
+                            <div class="aqi-segment aqi-moderate"></div>
+                            <div class="aqi-segment aqi-unhealthy-sensitive"></div>
+                            <div class="aqi-segment aqi-unhealthy"></div>
+                            <div class="aqi-segment aqi-very-unhealthy"></div>
+                            <div class="aqi-segment aqi-hazardous"></div>
+                        </div>
+                        <div class="aqi-marker"></div>
+                    </div>
+                    
+                    <div class="health-advice">
+                        <h3>Health Recommendations:</h3>
+                        <ul>
+                            {% for recommendation in health_advice %}<li>{{ recommendation }}</li>{% endfor %}
+                        </ul>
+                    </div>
+                    
+                    <p>Stay safe and take necessary precautions.</p>
+                    
+                    <p>Regards,<br/>AirAlert Team</p>
+                    
+                    <a href="https://airalert-dashboard.example.com/alerts/{{ alert_id }}" class="button">View on Dashboard</a>
+                </div>
+                <div class="footer">
+                    <p>This is an automated message from the AirAlert air quality monitoring system.</p>
+                    <p>To update your notification preferences, visit your <a href="https://airalert-dashboard.example.com/profile/settings">account settings</a>.</p>
+                    <p>If you wish to unsubscribe from these alerts, <a href="https://airalert-dashboard.example.com/unsubscribe?token={{ unsubscribe_token }}">click here</a>.</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+# Template sources by name
+_TEMPLATES = {
+    "alert_email": _ALERT_EMAIL_TEMPLATE,
+}
+
+# Compiled templates by name, filled on first use
+_template_cache: Dict[str, Template] = {}
+
+def _get_template(name: str) -> Template:
+    """
+    Get a compiled email template, compiling it on first use.
+    
+    Args:
+        name: Template name
+        
+    Returns:
+        Compiled Jinja template
+    """
+    template = _template_cache.get(name)
+    if template is None:
+        template = Template(_TEMPLATES[name])
+        _template_cache[name] = template
+    return template
+
 class EmailSender(NotificationSender):
     """Sends notifications via email."""
     
-    def __init__(self, config: Dict[str, Any], db_session: AsyncSession):
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        db_session: AsyncSession,
+        db_lock: Optional[asyncio.Lock] = None
+    ):
         """
         Initialize with configuration and database session.
         
         Args:
             config: Configuration parameters for the email sender
             db_session: SQLAlchemy async session for database updates
+            db_lock: Lock shared with other users of db_session (optional)
         """
         super().__init__(config)
         self.db_session = db_session
@@ -42,6 +154,9 @@ class EmailSender(NotificationSender):
         # Connection pooling
         self._connection = None
         self._connection_lock = asyncio.Lock()
+        
+        # Batches may run concurrently; the session only supports one operation at a time
+        self._db_lock = db_lock or asyncio.Lock()
     
     async def _get_connection(self) -> smtplib.SMTP:
         """
@@ -87,6 +202,24 @@ class EmailSender(NotificationSender):
         """
         Send notification via email.
         
+        Args:
+            notification: The notification to send
+            
+        Returns:
+            True if email was sent successfully, False otherwise
+        """
+        success = await self._deliver(notification)
+        
+        if success:
+            # Update notification status
+            await self._update_notification_status([notification.id])
+            
+        return success
+    
+    async def _deliver(self, notification: Notification) -> bool:
+        """
+        Send a notification email without recording the result.
+        
         Args:
             notification: The notification to send
             
@@ -98,8 +231,9 @@ class EmailSender(NotificationSender):
             from sqlalchemy import select
             
             user_stmt = select(User).where(User.id == notification.user_id)
-            user_result = await self.db_session.execute(user_stmt)
-            user = user_result.scalar_one_or_none()
+            async with self._db_lock:
+                user_result = await self.db_session.execute(user_stmt)
+                user = user_result.scalar_one_or_none()
             
             if not user or not user.email:
                 self.logger.error(f"User {notification.user_id} has no email address")
@@ -109,13 +243,7 @@ class EmailSender(NotificationSender):
             subject, body = self._format_email_content(notification)
             
             # Send email
-            success = await self._send_email(user.email, user.name, subject, body)
-            
-            if success:
-                # Update notification status
-                await self._update_notification_status(notification.id)
-                
-            return success
+            return await self._send_email(user.email, user.name, subject, body)
             
         except Exception as e:
             self.logger.error(f"Error sending email notification: {str(e)}")
@@ -134,7 +262,12 @@ class EmailSender(NotificationSender):
         results = {}
         
         for notification in notifications:
-            results[notification.id] = await self.send_notification(notification)
+            results[notification.id] = await self._deliver(notification)
+        
+        # Record every successful send with a single UPDATE and commit
+        sent_ids = [notif_id for notif_id, success in results.items() if success]
+        if sent_ids:
+            await self._update_notification_status(sent_ids)
             
         return results
     
@@ -161,87 +294,23 @@ class EmailSender(NotificationSender):
         # Format subject line
         subject = f"{severity_emoji} Air Quality Alert: {pollutant} levels are {self._get_severity_text(severity_level)}"
         
-        # Create HTML body with styling
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #3498db; color: white; padding: 10px; text-align: center; border-radius: 5px 5px 0 0; }}
-                .content {{ padding: 20px; background-color: #f9f9f9; }}
-                .footer {{ font-size: 12px; text-align: center; margin-top: 20px; color: #777; padding: 10px; background-color: #f1f1f1; border-radius: 0 0 5px 5px; }}
-                .alert-level {{ font-weight: bold; }}
-                .alert-details {{ background-color: #eaf2f8; padding: 15px; border-radius: 5px; margin: 15px 0; }}
-                .health-advice {{ background-color: #e8f8f5; padding: 15px; border-radius: 5px; margin: 15px 0; border-left: 4px solid #3498db; }}
-                .health-advice h3 {{ margin-top: 0; color: #16a085; }}
-                .health-advice ul {{ padding-left: 20px; }}
-                .value {{ font-weight: bold; color: {self._get_severity_color(severity_level)}; }}
-                .button {{ display: inline-block; background-color: #3498db; color: white; text-decoration: none; padding: 10px 20px; border-radius: 5px; margin-top: 15px; }}
-                .aqi-scale {{ display: flex; margin: 15px 0; border-radius: 5px; overflow: hidden; }}
-                .aqi-segment {{ height: 10px; flex-grow: 1; }}
-                .aqi-good {{ background-color: #00e400; }}
-                .aqi-moderate {{ background-color: #ffff00; }}
-                .aqi-unhealthy-sensitive {{ background-color: #ff7e00; }}
-                .aqi-unhealthy {{ background-color: #ff0000; }}
-                .aqi-very-unhealthy {{ background-color: #8f3f97; }}
-                .aqi-hazardous {{ background-color: #7e0023; }}
-                .aqi-marker {{ width: 0; height: 0; border-left: 10px solid transparent; border-right: 10px solid transparent; border-bottom: 10px solid black; margin-left: calc({min(severity_level * 20, 100)}% - 10px); }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>{severity_emoji} Air Quality Alert</h2>
-                </div>
-                <div class="content">
-                    <p>Hello {notification.user.name or 'Resident'},</p>
-                    
-                    <p>{notification.message}</p>
-                    
-                    <div class="alert-details">
-                        <h3>Alert Details:</h3>
-                        <ul>
-                            <li>Pollutant: <span class="value">{pollutant}</span></li>
-                            <li>Current Value: <span class="value">{current_value}</span> (Threshold: {threshold})</li>
-                            <li>Status: <span class="value">{self._get_severity_text(severity_level)}</span></li>
-                            <li>Location: Your {notification.location_type} area</li>
-                            <li>Alert Time: {notification.alert.created_at.strftime('%Y-%m-%d %H:%M')}</li>
-                        </ul>
-                        
-                        <div class="aqi-scale">
-                            <div class="aqi-segment aqi-good"></div>
-                            <div class="aqi-segment aqi-moderate"></div>
-                            <div class="aqi-segment aqi-unhealthy-sensitive"></div>
-                            <div class="aqi-segment aqi-unhealthy"></div>
-                            <div class="aqi-segment aqi-very-unhealthy"></div>
-                            <div class="aqi-segment aqi-hazardous"></div>
-                        </div>
-                        <div class="aqi-marker"></div>
-                    </div>
-                    
-                    <div class="health-advice">
-                        <h3>Health Recommendations:</h3>
-                        <ul>
-                            {self._format_recommendations_list(health_advice)}
-                        </ul>
-                    </div>
-                    
-                    <p>Stay safe and take necessary precautions.</p>
-                    
-                    <p>Regards,<br/>AirAlert Team</p>
-                    
-                    <a href="https://airalert-dashboard.example.com/alerts/{notification.alert.id}" class="button">View on Dashboard</a>
-                </div>
-                <div class="footer">
-                    <p>This is an automated message from the AirAlert air quality monitoring system.</p>
-                    <p>To update your notification preferences, visit your <a href="https://airalert-dashboard.example.com/profile/settings">account settings</a>.</p>
-                    <p>If you wish to unsubscribe from these alerts, <a href="https://airalert-dashboard.example.com/unsubscribe?token={self._generate_unsubscribe_token(notification.user_id)}">click here</a>.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        # Render the shared HTML body template
+        body = _get_template("alert_email").render(
+            severity_emoji=severity_emoji,
+            severity_color=self._get_severity_color(severity_level),
+            severity_text=self._get_severity_text(severity_level),
+            marker_offset=min(severity_level * 20, 100),
+            user_name=notification.user.name or 'Resident',
+            message=notification.message,
+            pollutant=pollutant,
+            current_value=current_value,
+            threshold=threshold,
+            location_type=notification.location_type,
+            alert_time=notification.alert.created_at.strftime('%Y-%m-%d %H:%M'),
+            health_advice=health_advice,
+            alert_id=notification.alert.id,
+            unsubscribe_token=self._generate_unsubscribe_token(notification.user_id)
+        )
         
         return subject, body
     
@@ -308,24 +377,26 @@ class EmailSender(NotificationSender):
                     
             return False
     
-    async def _update_notification_status(self, notification_id: int) -> None:
+    async def _update_notification_status(self, notification_ids: List[int]) -> None:
         """
         Update notification status after sending.
         
         Args:
-            notification_id: ID of the sent notification
+            notification_ids: IDs of the sent notifications
         """
         now = datetime.now()
         
         stmt = update(Notification).where(
-            Notification.id == notification_id
+            Notification.id.in_(notification_ids)
         ).values(
             delivery_channel="email",
-            sent_at=now
+            sent_at=now,
+            status="sent"
         )
         
-        await self.db_session.execute(stmt)
-        await self.db_session.commit()
+        async with self._db_lock:
+            await self.db_session.execute(stmt)
+            await self.db_session.commit()
     
     def _get_health_advice(self, pollutant: str, severity_level: int) -> List[str]:
         """
@@ -461,10 +532,6 @@ class EmailSender(NotificationSender):
         }
         return colors.get(severity_level, "#777777")
     
-    def _format_recommendations_list(self, recommendations: List[str]) -> str:
-        """Format list of recommendations as HTML list items."""
-        return "".join([f"<li>{recommendation}</li>" for recommendation in recommendations])
-    
     def _generate_unsubscribe_token(self, user_id: int) -> str:
         """Generate token for unsubscribe link."""
         import hashlib
@@ -505,11 +572,11 @@ async def send_email(to_email: str, subject: str, body: str, html_body: Optional
         True if email was sent successfully, False otherwise
     """
     try:
-        # Load environment variables for email config
+        # Load environment variables for email config (read once per process)
         import os
-        from dotenv import load_dotenv
+        from ..config import load_environment
         
-        load_dotenv()
+        load_environment()
         
         host = os.getenv("EMAIL_HOST", "smtp.gmail.com")
         port = int(os.getenv("EMAIL_PORT", 587))
@@ -4,15 +4,21 @@ Orchestrates notifications across multiple delivery channels.
 """
 import logging
 import asyncio
-import smtplib
-from datetime import datetime
-from typing import Dict, Any, List, Optional, Set
+import weakref
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, Any, List, Optional, Set, Tuple
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, and_
+from sqlalchemy import select, insert, update, and_, event, bindparam, func
+from sqlalchemy.orm import joinedload
 from pydantic import BaseModel, Field
+from cachetools import TTLCache
+from aiolimiter import AsyncLimiter
+import aiosmtplib
 
 from .base import NotificationSender, SMSNotificationSender, WebNotificationSender, EmailNotificationSender
 from ..models.alerts import Alert, Notification
@@ -20,6 +26,145 @@ from ..models.users import User
 from .email import EmailSender
 from ..api.config import settings
 
+# Statements used on the dispatch path, built once so SQLAlchemy's compiled
+# cache can reuse them. Pending rows are ordered by user so each user's
+# notifications arrive contiguously, then by primary key (Notification has no
+# created_at column; the key follows insertion order).
+_PENDING_NOTIFS = select(Notification.id, Notification.user_id).where(
+    and_(
+        Notification.sent_at.is_(None),
+        Notification.status == "pending"
+    )
+).order_by(
+    Notification.user_id,
+    Notification.id
+)
+_PENDING_NOTIFS_FOR_ALERTS = select(Notification.id, Notification.user_id).where(
+    and_(
+        Notification.alert_id.in_(bindparam("alert_ids", expanding=True)),
+        Notification.sent_at.is_(None),
+        Notification.status == "pending"
+    )
+).order_by(
+    Notification.user_id,
+    Notification.id
+)
+_NOTIFS_BY_IDS = select(Notification).options(
+    joinedload(Notification.alert)
+).where(
+    Notification.id.in_(bindparam("notification_ids", expanding=True))
+).order_by(
+    Notification.id
+)
+_ALERT_IDS_BY_IDS = select(Alert.id).where(Alert.id.in_(bindparam("alert_ids", expanding=True)))
+_USERS_BY_IDS = select(User).where(User.id.in_(bindparam("user_ids", expanding=True)))
+# Claimed rows whose delivery never finished (e.g. the process died mid-send)
+_RELEASE_STALE_CLAIMS = update(Notification).where(
+    and_(
+        Notification.status == "sending",
+        Notification.claimed_at < bindparam("cutoff")
+    )
+).values(
+    status="pending",
+    claimed_at=None
+)
+
+class SMTPPool:
+    """
+    Small pool of SMTP connections, opened lazily and kept open across sends.
+    
+    SMTP handles one message at a time per connection, so up to size sends run
+    in parallel, each on its own connection. A pool is only used on the event
+    loop it was created on (see _get_smtp_pool).
+    """
+    
+    def __init__(self, size: int = 4):
+        """
+        Initialize an empty pool.
+        
+        Args:
+            size: Maximum number of open connections
+        """
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[aiosmtplib.SMTP] = []
+    
+    @staticmethod
+    async def _connect() -> aiosmtplib.SMTP:
+        """
+        Open a new connection and log in.
+        
+        Returns:
+            Connected and authenticated SMTP client
+        """
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.email_host or "smtp.gmail.com",
+            port=int(settings.email_port or 587),
+            start_tls=True
+        )
+        await smtp.connect()
+        await smtp.login(settings.email_username, settings.email_password)
+        return smtp
+    
+    @staticmethod
+    async def _quit(smtp: aiosmtplib.SMTP) -> None:
+        """Close a connection, ignoring errors from one that already dropped."""
+        try:
+            await smtp.quit()
+        except Exception:
+            pass
+    
+    async def send(self, message: MIMEMultipart) -> None:
+        """
+        Send a message on an idle connection, opening one if none is free.
+        
+        Args:
+            message: Message to send
+        """
+        async with self._slots:
+            smtp = self._idle.pop() if self._idle else None
+            
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+                try:
+                    await smtp.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # The server dropped an idle connection; reconnect once
+                    smtp = await self._connect()
+                    await smtp.send_message(message)
+            except Exception:
+                if smtp is not None:
+                    await self._quit(smtp)
+                raise
+            
+            self._idle.append(smtp)
+    
+    async def close(self) -> None:
+        """Close every idle connection."""
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._quit(smtp) for smtp in idle))
+
+# SMTP pools by event loop; connections and locks can't be shared across loops
+_smtp_pools: Dict[asyncio.AbstractEventLoop, SMTPPool] = {}
+
+def _get_smtp_pool() -> SMTPPool:
+    """
+    Get the SMTP pool for the running event loop, creating it on first use.
+    
+    Returns:
+        SMTP pool bound to the running loop
+    """
+    loop = asyncio.get_running_loop()
+    
+    # Forget pools whose loops have gone away
+    for closed in [other for other in _smtp_pools if other.is_closed()]:
+        del _smtp_pools[closed]
+    
+    if loop not in _smtp_pools:
+        _smtp_pools[loop] = SMTPPool(settings.smtp_pool_size)
+    
+    return _smtp_pools[loop]
+
 async def send_email(recipient: str, subject: str, html_content: str) -> bool:
     """
     Simple function to send an email using SMTP.
@@ -43,10 +188,6 @@ async def send_email(recipient: str, subject: str, html_content: str) -> bool:
         html_part = MIMEText(html_content, 'html')
         message.attach(html_part)
         
-        # Connect to SMTP server and send
-        smtp_host = settings.email_host or "smtp.gmail.com"
-        smtp_port = settings.email_port or 587
-        
         # Check if we have SMTP credentials configured
         if not settings.email_username or not settings.email_password:
             # For development, just log the email
@@ -54,11 +195,8 @@ async def send_email(recipient: str, subject: str, html_content: str) -> bool:
             logging.info(f"Content: {html_content}")
             return True
         
-        # Send the email
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(settings.email_username, settings.email_password)
-            server.send_message(message)
+        # Send the email over a pooled connection for this event loop
+        await _get_smtp_pool().send(message)
         
         return True
         
@@ -66,8 +204,6 @@ async def send_email(recipient: str, subject: str, html_content: str) -> bool:
         logging.error(f"Error sending email: {e}")
         return False
 from .web_push import send_web_push
-from backend.models.database import get_db
-from sqlalchemy.orm import Session
 
 class NotificationPreferences(BaseModel):
     """User notification preferences model."""
@@ -94,11 +230,46 @@ class NotificationManager:
         self.config = config or {}
         self.logger = logging.getLogger("NotificationManager")
         
+        # Notification preferences cache (user_id -> preferences), bounded in size and age
+        self._preferences_cache = TTLCache(
+            maxsize=self.config.get("pref_cache_size", 10_000),
+            ttl=self.config.get("pref_cache_ttl", 300)
+        )
+        _live_managers.add(self)
+        
+        # Bounds the number of send_batch calls in flight at once
+        self._sem = asyncio.Semaphore(self.config.get("max_concurrency", 32))
+        
+        # Per-channel token buckets keeping sends under each provider's rate limit,
+        # in messages per second
+        self._limiters: Dict[str, AsyncLimiter] = {
+            "sms": AsyncLimiter(self.config.get("sms_rps", 10), 1),
+            "email": AsyncLimiter(self.config.get("email_rps", 10), 1),
+            "web": AsyncLimiter(self.config.get("web_rps", 50), 1)
+        }
+        
+        # Serializes use of db_session between dispatch workers and senders
+        self._db_lock = asyncio.Lock()
+        
+        # Background email deliveries still running
+        self._inflight: Set[asyncio.Task] = set()
+        
+        # Alerts waiting for the debounced dispatch, and the task that will flush
+        # them; only used on the shared manager (see _shared_manager)
+        self._pending_alert_ids: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        
         # Initialize delivery channels if db_session is provided
+        self._senders: Dict[str, NotificationSender] = {}
         if db_session and config:
             self.sms_sender = SMSNotificationSender(config)
             self.web_sender = WebNotificationSender(config)
-            self.email_sender = EmailSender(config, db_session)
+            self.email_sender = EmailSender(config, db_session, db_lock=self._db_lock)
+            self._senders = {
+                "email": self.email_sender,
+                "sms": self.sms_sender,
+                "web": self.web_sender
+            }
             
     async def send_email_notification(
         self,
@@ -106,120 +277,225 @@ class NotificationManager:
         subject: str,
         html_content: str,
         user_id: Optional[int] = None,
-        db_session: Optional[AsyncSession] = None
+        db_session: Optional[AsyncSession] = None,
+        alert_id: Optional[int] = None
     ) -> bool:
         """
         Send an email notification and record it in the database.
         
+        Recorded emails are delivered by a background task so the caller doesn't
+        wait on the SMTP server. The row is claimed for that task (status
+        'sending') so the pending dispatcher doesn't send it too; if the send
+        fails it is handed back as pending for a retry.
+        
         Args:
             recipient_email: Email address to send to
             subject: Email subject
             html_content: HTML content of the email
             user_id: User ID to associate with notification (optional)
             db_session: Database session (optional) - if not provided, uses the instance's session
+            alert_id: Alert the email is about (optional) - only alert emails are recorded
             
         Returns:
-            bool: True if sent successfully, False otherwise
+            bool: True if sent (or recorded and queued for delivery), False otherwise
         """
         try:
             # Use provided session or instance session
             session = db_session or self.db_session
             
-            # If we don't have a session, just try to send directly
-            if not session:
+            # Notification rows require a user and an alert; otherwise just send directly
+            if not session or user_id is None or alert_id is None:
                 result = await send_email(recipient_email, subject, html_content)
                 return result
             
-            # Create notification record
-            notification = Notification(
-                user_id=user_id,
-                channel="email",
-                recipient=recipient_email,
-                subject=subject,
-                content=html_content,
-                status="pending",
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
+            notification_id = await self._record_notification(session, user_id, alert_id, html_content)
             
-            # Add to database
-            session.add(notification)
-            await session.commit()
-            await session.refresh(notification)
+            # Deliver out of band; the caller's session may be closed by the time this
+            # runs. The task is tracked by the shared manager, which outlives this one,
+            # so shutdown_notifications can wait for it.
+            shared = self._shared_manager(session.bind)
+            task = asyncio.create_task(shared._deliver_and_update(
+                notification_id, recipient_email, subject, html_content, session.bind
+            ))
+            shared._inflight.add(task)
+            task.add_done_callback(shared._inflight.discard)
             
-            # Send email
-            result = await send_email(recipient_email, subject, html_content)
-            
-            # Update status based on result
-            notification.status = "sent" if result else "failed"
-            notification.sent_at = datetime.utcnow() if result else None
-            await session.commit()
-            
-            return result
+            return True
         except Exception as e:
             self.logger.error(f"Error sending email notification: {e}")
             return False
+    
+    async def _record_notification(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        alert_id: int,
+        html_content: str
+    ) -> int:
+        """
+        Create an email notification row, claimed for delivery by the caller.
+        
+        Args:
+            session: Database session to insert with
+            user_id: User the notification is for
+            alert_id: Alert the notification is about
+            html_content: HTML content of the email
+            
+        Returns:
+            ID of the new notification
+        """
+        # Create notification record, getting its ID back from the same statement.
+        # It is inserted already claimed, so the insert trigger's wakeup (or a
+        # concurrent poll) can't pick it up while it is being delivered.
+        stmt = insert(Notification).values(
+            alert_id=alert_id,
+            user_id=user_id,
+            delivery_channel="email",
+            message=html_content,
+            status="sending",
+            claimed_at=datetime.now()
+        ).returning(Notification.id)
         
-        # Notification preferences cache (user_id -> preferences)
-        self._preferences_cache = {}
+        notification_id = (await session.execute(stmt)).scalar_one()
+        await session.commit()
         
-    async def process_pending_notifications(self) -> Dict[str, int]:
+        return notification_id
+    
+    async def _deliver_and_update(
+        self,
+        notification_id: int,
+        recipient_email: str,
+        subject: str,
+        html_content: str,
+        bind
+    ) -> None:
         """
-        Process all pending notifications.
+        Send a recorded email and mark its notification as sent, or release it
+        back to pending if the send failed.
+        
+        Args:
+            notification_id: ID of the recorded notification
+            recipient_email: Email address to send to
+            subject: Email subject
+            html_content: HTML content of the email
+            bind: Engine or connection to open the status-update session on
+        """
+        try:
+            result = await send_email(recipient_email, subject, html_content)
+        except Exception as e:
+            self.logger.error(f"Error delivering email notification {notification_id}: {e}")
+            result = False
+        
+        try:
+            async with AsyncSession(bind) as session:
+                if result:
+                    await self.record_results([(notification_id, result)], "email", session)
+                else:
+                    # Hand the row back to the pending poller for a retry
+                    await session.execute(
+                        update(Notification).where(
+                            Notification.id == notification_id
+                        ).values(status="pending", claimed_at=None)
+                    )
+                    await session.commit()
+        except Exception as e:
+            # The claim expires and release_stale_claims hands the row back
+            self.logger.error(f"Error recording email notification {notification_id}: {e}")
+    
+    async def release_stale_claims(self) -> int:
+        """
+        Return notifications stuck in 'sending' to pending.
+        
+        A claim older than config["claim_timeout_minutes"] means its background
+        delivery never finished (the process exited, or recording the outcome
+        failed), so the row is handed back to the pending dispatcher.
         
         Returns:
-            Dictionary with counts of notifications processed by channel
+            Number of notifications released
         """
-        self.logger.info("Processing pending notifications")
+        cutoff = datetime.now() - timedelta(minutes=self.config.get("claim_timeout_minutes", 15))
+        
+        async with self._db_lock:
+            result = await self.db_session.execute(_RELEASE_STALE_CLAIMS, {"cutoff": cutoff})
+            await self.db_session.commit()
+        
+        if result.rowcount:
+            self.logger.warning(f"Released {result.rowcount} stale email notification claims")
+        
+        return result.rowcount
+    
+    async def wait_for_inflight(self) -> None:
+        """Wait for all background email deliveries to finish (see shutdown_notifications)."""
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+    
+    async def record_results(
+        self,
+        send_results: List[Tuple[int, bool]],
+        channel: str,
+        db_session: Optional[AsyncSession] = None
+    ) -> None:
+        """
+        Record the outcome of a batch of sends with one bulk UPDATE and one commit.
+        
+        Sent notifications get their delivery channel, sent_at and status set;
+        failed ones are left pending so they are picked up again.
+        
+        Args:
+            send_results: (notification ID, success) pairs
+            channel: Channel the notifications were sent through
+            db_session: Database session (optional) - if not provided, uses the instance's session
+        """
+        session = db_session or self.db_session
+        
+        sent_ids = [notif_id for notif_id, success in send_results if success]
+        failed_count = len(send_results) - len(sent_ids)
+        
+        if failed_count:
+            self.logger.warning(f"{failed_count} {channel} notifications failed to send")
+        
+        if not sent_ids:
+            return
         
-        # Get all unsent notifications
-        query = select(Notification).where(
-            Notification.sent_at == None
-        ).order_by(
-            Notification.created_at
+        stmt = update(Notification).where(
+            Notification.id.in_(sent_ids)
+        ).values(
+            delivery_channel=channel,
+            sent_at=func.now(),
+            status="sent"
         )
         
-        result = await self.db_session.execute(query)
-        notifications = result.scalars().all()
+        await session.execute(stmt)
+        await session.commit()
         
-        if not notifications:
-            self.logger.info("No pending notifications found")
-            return {"total": 0}
+    async def process_pending_notifications(self) -> Dict[str, int]:
+        """
+        Process all pending notifications.
         
-        self.logger.info(f"Found {len(notifications)} pending notifications")
+        Returns:
+            Dictionary with counts of notifications processed by channel
+        """
+        self.logger.info("Processing pending notifications")
         
-        # Group by user
-        by_user: Dict[int, List[Notification]] = {}
-        for notif in notifications:
-            if notif.user_id not in by_user:
-                by_user[notif.user_id] = []
-            by_user[notif.user_id].append(notif)
-            
-        # Process each user's notifications
         results = {
-            "total": len(notifications),
+            "total": 0,
             "email": 0,
             "sms": 0,
             "web": 0,
             "failed": 0
         }
         
-        for user_id, user_notifications in by_user.items():
-            channels = await self._get_preferred_channels(user_id)
-            
-            for channel in channels:
-                if channel == "email":
-                    sent = await self.email_sender.send_batch(user_notifications)
-                    results["email"] += sum(1 for success in sent.values() if success)
-                    results["failed"] += sum(1 for success in sent.values() if not success)
-                elif channel == "sms":
-                    sent = await self.sms_sender.send_batch(user_notifications)
-                    results["sms"] += sum(1 for success in sent.values() if success)
-                    results["failed"] += sum(1 for success in sent.values() if not success)
-                elif channel == "web":
-                    sent = await self.web_sender.send_batch(user_notifications)
-                    results["web"] += sum(1 for success in sent.values() if success)
-                    results["failed"] += sum(1 for success in sent.values() if not success)
+        # Pick up deliveries that were claimed but never finished
+        await self.release_stale_claims()
+        
+        # Stream all unsent notifications through the dispatch workers
+        await self._dispatch_pending(_PENDING_NOTIFS, None, results)
+        
+        if not results["total"]:
+            self.logger.info("No pending notifications found")
+            return {"total": 0}
+        
+        self.logger.info(f"Processed {results['total']} pending notifications")
         
         return results
         
@@ -227,106 +503,485 @@ class NotificationManager:
         """
         Send notifications for a specific alert.
         
+        Alerts requested within config["alert_debounce_ms"] of each other are
+        dispatched together with a single query, so a burst of alerts costs one
+        dispatch pass instead of one per alert. Callers usually build a manager
+        per alert, so the window and the flush belong to the long-lived manager
+        for this event loop and database. The returned counts cover the whole
+        batch the alert was dispatched with.
+        
         Args:
             alert_id: ID of the alert
             
         Returns:
             Dictionary with counts of notifications sent by channel
         """
-        # Get alert details
-        alert_query = select(Alert).where(Alert.id == alert_id)
-        alert_result = await self.db_session.execute(alert_query)
-        alert = alert_result.scalar_one_or_none()
+        shared = self._shared_manager()
+        
+        shared._pending_alert_ids.add(alert_id)
+        if shared._flush_task is None:
+            shared._flush_task = asyncio.create_task(
+                shared._flush_after(self.config.get("alert_debounce_ms", 200))
+            )
         
-        if not alert:
+        # Shield the shared flush so one cancelled caller doesn't cancel it for the rest
+        found_ids, results = await asyncio.shield(shared._flush_task)
+        
+        if alert_id not in found_ids:
             self.logger.error(f"Alert {alert_id} not found")
             return {"error": "Alert not found", "sent": 0}
-            
-        # Get notifications for this alert
-        notif_query = select(Notification).where(
-            and_(
-                Notification.alert_id == alert_id,
-                Notification.sent_at == None
-            )
-        )
-        notif_result = await self.db_session.execute(notif_query)
-        notifications = notif_result.scalars().all()
         
-        if not notifications:
+        if not results["total"]:
             self.logger.info(f"No pending notifications found for alert {alert_id}")
             return {"alert_id": alert_id, "sent": 0}
+        
+        return {**results, "alert_id": alert_id}
+    
+    def _shared_manager(self, bind=None) -> "NotificationManager":
+        """
+        Get the long-lived manager for the running event loop and a database.
+        
+        It has its own session and keeps its preference cache and rate limiters
+        across requests. Managers of event loops that have closed are dropped.
+        
+        Args:
+            bind: Engine or connection of the database (optional) - defaults to this manager's session's
+        
+        Returns:
+            Shared manager, created on first use
+        """
+        loop = asyncio.get_running_loop()
+        
+        for closed in [other for other in _shared_managers if other.is_closed()]:
+            del _shared_managers[closed]
+        
+        managers = _shared_managers.setdefault(loop, {})
+        if bind is None:
+            bind = self.db_session.bind
+        if bind not in managers:
+            managers[bind] = NotificationManager(AsyncSession(bind), self.config)
+        
+        return managers[bind]
+    
+    async def _flush_after(self, debounce_ms: int) -> Tuple[Set[int], Dict[str, Any]]:
+        """
+        Wait for the debounce window, then dispatch every alert collected in it.
+        
+        Args:
+            debounce_ms: Time to wait for more alerts before dispatching, in milliseconds
             
-        # Group by user
-        by_user: Dict[int, List[Notification]] = {}
-        for notif in notifications:
-            if notif.user_id not in by_user:
-                by_user[notif.user_id] = []
-            by_user[notif.user_id].append(notif)
+        Returns:
+            Tuple of (IDs of the alerts that exist, counts of notifications sent by channel)
+        """
+        await asyncio.sleep(debounce_ms / 1000)
+        
+        # Take the batch; alerts requested from here on start a new window
+        alert_ids, self._pending_alert_ids = self._pending_alert_ids, set()
+        self._flush_task = None
+        
+        return await self._dispatch_alerts(alert_ids)
+    
+    async def _dispatch_alerts(self, alert_ids: Set[int]) -> Tuple[Set[int], Dict[str, Any]]:
+        """
+        Dispatch pending notifications for a batch of alerts.
+        
+        Args:
+            alert_ids: IDs of the alerts to dispatch
             
+        Returns:
+            Tuple of (IDs of the alerts that exist, counts of notifications sent by channel)
+        """
+        # Get the alerts that exist
+        async with self._db_lock:
+            alert_result = await self.db_session.execute(
+                _ALERT_IDS_BY_IDS, {"alert_ids": list(alert_ids)}
+            )
+            found_ids = set(alert_result.scalars().all())
+        
         # Count sent notifications
         results = {
-            "alert_id": alert_id,
-            "total": len(notifications),
+            "alert_ids": sorted(found_ids),
+            "total": 0,
             "email": 0,
             "sms": 0,
             "web": 0,
             "failed": 0
         }
         
-        # Process each user's notifications
-        for user_id, user_notifications in by_user.items():
-            channels = await self._get_preferred_channels(user_id)
+        if found_ids:
+            # Process each user's notifications across all alerts in the batch
+            await self._dispatch_pending(
+                _PENDING_NOTIFS_FOR_ALERTS, {"alert_ids": list(found_ids)}, results
+            )
+        
+        return found_ids, results
+    
+    async def _dispatch_pending(
+        self,
+        query,
+        params: Optional[Dict[str, Any]],
+        results: Dict[str, int]
+    ) -> None:
+        """
+        Dispatch pending notifications through a bounded producer/consumer queue.
+        
+        A single producer streams (id, user_id) rows into shards and puts them
+        on a queue of at most config["notification_buffer"] shards;
+        config["workers"] consumers hydrate and send each shard. Memory stays
+        proportional to the buffer rather than to the number of pending rows,
+        and a full queue pauses the producer.
+        
+        Args:
+            query: Statement selecting Notification.id and Notification.user_id
+            params: Bound parameters for the statement (optional)
+            results: Counters to update with total/sent/failed counts
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.get("notification_buffer", 16))
+        workers = [
+            asyncio.create_task(self._dispatch_worker(queue, results))
+            for _ in range(self.config.get("workers", 8))
+        ]
+        
+        try:
+            await self._produce_pending(query, params, queue, results)
+        finally:
+            # One sentinel per worker to shut them down once the queue drains
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+    
+    async def _produce_pending(
+        self,
+        query,
+        params: Optional[Dict[str, Any]],
+        queue: asyncio.Queue,
+        results: Dict[str, int]
+    ) -> None:
+        """
+        Stream pending notification keys and enqueue them as per-user shards.
+        
+        Rows are read on a separate session so the open cursor is neither
+        interleaved with nor closed by the workers' commits, and are fetched
+        config["stream_yield_per"] at a time so only one partition is buffered.
+        Rows arrive ordered by user, so shards are only cut between users: a
+        shard is flushed once it reaches config["hydrate_batch_size"]
+        notifications and the next user begins.
+        
+        Args:
+            query: Statement selecting Notification.id and Notification.user_id
+            params: Bound parameters for the statement (optional)
+            queue: Queue feeding the dispatch workers
+            results: Counters to update with the total number of rows seen
+        """
+        shard_limit = self.config.get("hydrate_batch_size", 1000)
+        shard: Dict[int, List[int]] = {}
+        shard_size = 0
+        
+        async with AsyncSession(self.db_session.bind) as reader:
+            result = await reader.stream(
+                query,
+                params,
+                execution_options={"yield_per": self.config.get("stream_yield_per", 500)}
+            )
+            async for partition in result.partitions():
+                results["total"] += len(partition)
+                
+                for user_id, rows in groupby(partition, key=attrgetter("user_id")):
+                    if user_id not in shard:
+                        # A new user starts here, so the shard can be cut cleanly
+                        if shard_size >= shard_limit:
+                            await queue.put(shard)
+                            shard = {}
+                            shard_size = 0
+                        shard[user_id] = []
+                    
+                    notif_ids = [row.id for row in rows]
+                    shard[user_id].extend(notif_ids)
+                    shard_size += len(notif_ids)
+        
+        if shard:
+            await queue.put(shard)
+    
+    async def _dispatch_worker(self, queue: asyncio.Queue, results: Dict[str, int]) -> None:
+        """
+        Hydrate and send queued shards until a None sentinel is received.
+        
+        Args:
+            queue: Queue of notification IDs grouped by user ID
+            results: Counters to update with sent/failed totals
+        """
+        while True:
+            shard = await queue.get()
+            if shard is None:
+                break
+            
+            try:
+                async with self._db_lock:
+                    await self._warm_preferences(shard.keys())
+                    by_user = await self._load_notifications(shard)
+                    
+                    skipped = {
+                        "duplicate": self._drop_duplicates(by_user),
+                        "below_threshold": self._drop_below_severity(by_user)
+                    }
+                    if any(skipped.values()):
+                        await self._mark_skipped(skipped)
+                
+                await self._dispatch_by_user(by_user, results)
+            except Exception as e:
+                self.logger.error(f"Error dispatching notification shard: {e}")
+                # Don't leave the shared session in a failed transaction for the other shards
+                try:
+                    async with self._db_lock:
+                        await self.db_session.rollback()
+                except Exception as rollback_error:
+                    self.logger.error(f"Error rolling back after failed shard: {rollback_error}")
+    
+    async def _load_notifications(
+        self,
+        ids_by_user: Dict[int, List[int]]
+    ) -> Dict[int, List[Notification]]:
+        """
+        Load full Notification objects, with their alerts, for a shard of users in one query.
+        
+        Args:
+            ids_by_user: Notification IDs grouped by user ID
             
-            # Only send to channels the user has enabled
-            for channel in channels:
-                if channel == "email":
-                    sent = await self.email_sender.send_batch(user_notifications)
-                    results["email"] += sum(1 for success in sent.values() if success)
-                    results["failed"] += sum(1 for success in sent.values() if not success)
-                elif channel == "sms":
-                    sent = await self.sms_sender.send_batch(user_notifications)
-                    results["sms"] += sum(1 for success in sent.values() if success)
-                    results["failed"] += sum(1 for success in sent.values() if not success)
-                elif channel == "web":
-                    sent = await self.web_sender.send_batch(user_notifications)
-                    results["web"] += sum(1 for success in sent.values() if success)
-                    results["failed"] += sum(1 for success in sent.values() if not success)
+        Returns:
+            Notifications grouped by user ID
+        """
+        notif_ids = [notif_id for ids in ids_by_user.values() for notif_id in ids]
+        notif_result = await self.db_session.execute(
+            _NOTIFS_BY_IDS, {"notification_ids": notif_ids}
+        )
         
-        return results
+        # Group by user
+        by_user: Dict[int, List[Notification]] = {}
+        for notif in notif_result.scalars().all():
+            if notif.user_id not in by_user:
+                by_user[notif.user_id] = []
+            by_user[notif.user_id].append(notif)
+            
+        return by_user
     
-    async def _get_preferred_channels(self, user_id: int) -> Set[str]:
+    @staticmethod
+    def _drop_duplicates(by_user: Dict[int, List[Notification]]) -> List[int]:
         """
-        Get user's preferred notification channels.
+        Keep only the first notification per alert for each user.
+        
+        The kept notification is sent on every channel the user has enabled, so
+        rows created per channel for the same alert (e.g. admin broadcasts) are
+        covered by it.
         
         Args:
-            user_id: User ID
+            by_user: Notifications grouped by user ID, pruned in place
             
         Returns:
-            Set of channel names (email, sms, web)
+            IDs of the notifications that were dropped
         """
-        # Check cache first
-        if user_id in self._preferences_cache:
-            prefs = self._preferences_cache[user_id]
-        else:
-            # Get user preferences from database
-            user_query = select(User).where(User.id == user_id)
-            user_result = await self.db_session.execute(user_query)
-            user = user_result.scalar_one_or_none()
+        duplicate_ids = []
+        
+        for user_id, notifications in by_user.items():
+            seen = set()
+            unique = []
+            for notif in notifications:
+                if notif.alert_id in seen:
+                    duplicate_ids.append(notif.id)
+                else:
+                    seen.add(notif.alert_id)
+                    unique.append(notif)
+            by_user[user_id] = unique
             
-            if not user:
-                self.logger.error(f"User {user_id} not found")
-                return set()
-                
-            # Use defaults if user has no specific preferences
-            prefs = NotificationPreferences(
-                email=getattr(user, "pref_email", True),
-                sms=getattr(user, "pref_sms", True),
-                web=getattr(user, "pref_web", True),
-                minimum_severity=getattr(user, "pref_min_severity", 1)
+        return duplicate_ids
+    
+    def _drop_below_severity(self, by_user: Dict[int, List[Notification]]) -> List[int]:
+        """
+        Drop notifications for alerts below each user's minimum severity.
+        
+        Admin broadcasts are always delivered, whatever their severity.
+        
+        Args:
+            by_user: Notifications grouped by user ID, pruned in place
+            
+        Returns:
+            IDs of the notifications that were dropped
+        """
+        below_ids = []
+        
+        for user_id, notifications in by_user.items():
+            prefs = self._preferences_cache.get(user_id)
+            if prefs is None:
+                continue
+            
+            kept = []
+            for notif in notifications:
+                alert = notif.alert
+                if alert.alert_type == "admin_broadcast" or alert.severity_level >= prefs.minimum_severity:
+                    kept.append(notif)
+                else:
+                    below_ids.append(notif.id)
+            by_user[user_id] = kept
+            
+        return below_ids
+    
+    async def _mark_skipped(self, skipped: Dict[str, List[int]]) -> None:
+        """
+        Mark notifications that will not be sent so they are not polled again.
+        
+        The reason is recorded as the row's status; delivery_channel and
+        sent_at are left alone, since nothing was delivered.
+        
+        Args:
+            skipped: Notification IDs keyed by the reason they were skipped
+        """
+        for reason, notification_ids in skipped.items():
+            if not notification_ids:
+                continue
+            
+            self.logger.info(f"Skipping {len(notification_ids)} notifications ({reason})")
+            
+            stmt = update(Notification).where(
+                Notification.id.in_(notification_ids)
+            ).values(
+                status=reason
             )
+            await self.db_session.execute(stmt)
+        
+        await self.db_session.commit()
+    
+    async def _dispatch_by_user(
+        self,
+        by_user: Dict[int, List[Notification]],
+        results: Dict[str, int]
+    ) -> None:
+        """
+        Send grouped notifications over every enabled channel concurrently.
+        
+        Args:
+            by_user: Pending notifications grouped by user ID
+            results: Counters to update with sent/failed totals
+        """
+        # Only send to channels the user has enabled
+        tasks = [
+            self._send_channel(channel, user_notifications)
+            for user_id, user_notifications in by_user.items()
+            if user_notifications
+            for channel in self._channels_for(user_id)
+        ]
+        
+        results_list = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for outcome in results_list:
+            if isinstance(outcome, Exception):
+                self.logger.error(f"Error dispatching notifications: {outcome}")
+                continue
+            
+            self._count_send(*outcome, results)
+    
+    @staticmethod
+    def _count_send(channel: str, sent: Dict[int, bool], results: Dict[str, int]) -> None:
+        """
+        Add one send_batch outcome to the result counters.
+        
+        Args:
+            channel: Channel the batch was sent through
+            sent: Mapping of notification IDs to success status
+            results: Counters to update with sent/failed totals
+        """
+        ok = sum(1 for success in sent.values() if success)
+        results[channel] += ok
+        results["failed"] += len(sent) - ok
+    
+    async def _send_channel(
+        self,
+        channel: str,
+        notifications: List[Notification]
+    ) -> Tuple[str, Dict[int, bool]]:
+        """
+        Send a user's notifications through one channel, rate-limited by the
+        channel's token bucket and bounded by the semaphore.
+        
+        One token is spent per notification, and all of them are acquired before
+        taking a semaphore slot, so a channel waiting on its rate limit never
+        holds slots the other channels could use.
+        
+        Args:
+            channel: Channel name (email, sms, web)
+            notifications: Notifications to send
             
-            # Cache the preferences
-            self._preferences_cache[user_id] = prefs
+        Returns:
+            Tuple of (channel, mapping of notification IDs to success status)
+        """
+        sender = self._senders.get(channel)
+        if not sender:
+            return channel, {}
+        
+        await self._acquire_tokens(self._limiters[channel], len(notifications))
+        
+        async with self._sem:
+            sent = await sender.send_batch(notifications)
+        
+        return channel, sent
+    
+    @staticmethod
+    async def _acquire_tokens(limiter: AsyncLimiter, count: int) -> None:
+        """
+        Take count tokens from a limiter, in steps no larger than its capacity.
+        
+        Args:
+            limiter: Token bucket to take from
+            count: Number of messages about to be sent
+        """
+        step = max(1, int(limiter.max_rate))
+        
+        while count > 0:
+            amount = min(count, step)
+            await limiter.acquire(amount)
+            count -= amount
+    
+    async def _warm_preferences(self, user_ids: Set[int]) -> None:
+        """
+        Load preferences for all uncached users with a single query.
+        
+        Args:
+            user_ids: IDs of the users about to be notified
+        """
+        missing = set(user_ids) - self._preferences_cache.keys()
+        if not missing:
+            return
+        
+        user_result = await self.db_session.execute(_USERS_BY_IDS, {"user_ids": list(missing)})
+        
+        for user in user_result.scalars().all():
+            self._preferences_cache[user.id] = self._preferences_from_user(user)
+    
+    @staticmethod
+    def _preferences_from_user(user: User) -> NotificationPreferences:
+        """Build notification preferences for a user, using defaults if unset."""
+        return NotificationPreferences(
+            email=getattr(user, "pref_email", True),
+            sms=getattr(user, "pref_sms", True),
+            web=getattr(user, "pref_web", True),
+            minimum_severity=getattr(user, "pref_min_severity", 1)
+        )
+    
+    def _channels_for(self, user_id: int) -> Set[str]:
+        """
+        Get user's preferred notification channels from the preferences cache.
+        
+        Callers load preferences with _warm_preferences first, so this never
+        awaits; users that were not found in the database get no channels.
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            Set of channel names (email, sms, web)
+        """
+        prefs = self._preferences_cache.get(user_id)
+        if prefs is None:
+            self.logger.error(f"User {user_id} not found")
+            return set()
         
         # Return enabled channels
         channels = set()
@@ -339,20 +994,71 @@ class NotificationManager:
             
         return channels
 
-def notify_users(alert: Alert, db: Session = get_db()):
-    """Send notifications to users for a given alert."""
-    users = db.query(User).all()
-    for user in users:
-        # Send email notification
-        send_email(
-            to=user.email,
-            subject=f"Air Quality Alert: {alert.pollutant}",
-            body=f"The AQI for {alert.pollutant} has exceeded the threshold. Current value: {alert.value} {alert.unit}."
-        )
+# Long-lived managers by event loop, then by database bind (see _shared_manager)
+_shared_managers: Dict[asyncio.AbstractEventLoop, Dict[Any, NotificationManager]] = {}
 
+async def shutdown_notifications() -> None:
+    """
+    Finish background notification work on the running event loop and release its resources.
+    
+    Waits for debounced flushes and background email deliveries, then closes
+    the shared managers' sessions and the loop's SMTP connections. Call from the
+    application's shutdown handler.
+    """
+    loop = asyncio.get_running_loop()
+    
+    for manager in _shared_managers.pop(loop, {}).values():
+        if manager._flush_task is not None:
+            await asyncio.gather(manager._flush_task, return_exceptions=True)
+        await manager.wait_for_inflight()
+        await manager.db_session.close()
+    
+    pool = _smtp_pools.pop(loop, None)
+    if pool is not None:
+        await pool.close()
+
+# Managers whose preference caches must forget a user when that user is updated
+_live_managers: "weakref.WeakSet[NotificationManager]" = weakref.WeakSet()
+
+@event.listens_for(User, "after_update", propagate=True)
+def _evict_cached_preferences(mapper, connection, target):
+    """Drop cached notification preferences for an updated user."""
+    for manager in list(_live_managers):
+        manager._preferences_cache.pop(target.id, None)
+
+async def notify_users(alert: Alert, db: AsyncSession, max_concurrency: int = 32) -> None:
+    """
+    Send notifications to users for a given alert.
+    
+    Args:
+        alert: Alert to notify users about
+        db: Database session owned by the caller (e.g. the request's session)
+        max_concurrency: Maximum number of sends in flight at once
+    """
+    result = await db.execute(select(User.id, User.email))
+    users = result.all()
+    
+    # The message is the same for every user, so build it once
+    subject = f"Air Quality Alert: {alert.pollutant}"
+    body = f"The AQI for {alert.pollutant} has exceeded the threshold. Current value: {alert.current_value}."
+    
+    sem = asyncio.Semaphore(max_concurrency)
+    
+    async def bounded(coro):
+        async with sem:
+            return await coro
+    
+    coros = []
+    for user_id, email in users:
+        # Send email notification
+        if email:
+            coros.append(bounded(send_email(email, subject, body)))
+        
         # Send web push notification
-        send_web_push(
-            user_id=user.id,
+        coros.append(bounded(send_web_push(
+            user_id=user_id,
             title="Air Quality Alert",
-            message=f"The AQI for {alert.pollutant} has exceeded the threshold. Current value: {alert.value} {alert.unit}."
-        )
+            message=body
+        )))
+    
+    await asyncio.gather(*coros, return_exceptions=True)
@@ -2,27 +2,72 @@
 Web Push notification sender for AirAlert.
 Handles sending notifications through web push.
 """
+import os
 import json
+import time
+import base64
+import functools
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
 from datetime import datetime
+from urllib.parse import urlparse
 import asyncio
+from collections import defaultdict
 
+import httpx
+import http_ece
+import orjson
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid02
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from pywebpush import webpush, WebPushException
+from sqlalchemy.orm import joinedload
 
 from .base import NotificationSender
 from ..models.alerts import Notification
 from ..models.users import User, WebPushSubscription
 
+class WebPushError(Exception):
+    """Raised when a push service rejects a web push."""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Push service returned {status}: {message}")
+        self.status = status
+
+
+def _b64url_decode(value: str) -> bytes:
+    """Decode unpadded URL-safe base64, as used in push subscription keys."""
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
 class WebPushSender(NotificationSender):
     """Sends notifications via web push."""
     
+    # Payload fields that are the same for every notification
+    _PAYLOAD_TEMPLATE = {
+        'icon': '/icons/alert-icon-192.png',
+        'badge': '/icons/alert-badge-96.png',
+        'vibrate': [100, 50, 100],  # Vibration pattern
+        'actions': [
+            {
+                'action': 'view',
+                'title': 'View Details'
+            },
+            {
+                'action': 'dismiss',
+                'title': 'Dismiss'
+            }
+        ]
+    }
+    
     def __init__(self, config: Dict[str, Any], db_session: AsyncSession):
         """
         Initialize with configuration and database session.
         
+        Tuning (per deployment):
+            push_batch_size: Notifications loaded and recorded per round trip (default 500)
+            push_parallelism: Pushes in flight at once (default 64)
+        
         Args:
             config: Configuration parameters for the web push sender
             db_session: SQLAlchemy async session for database updates
@@ -37,9 +82,33 @@ class WebPushSender(NotificationSender):
             'sub': f"mailto:{config.get('vapid_contact_email', 'admin@airalert.example.com')}"
         }
         
-        # Check if we have valid VAPID keys
-        if not self.vapid_private_key or not self.vapid_public_key:
+        self.ttl = config.get('push_ttl', 86400)
+        
+        self.batch_size = int(config.get('push_batch_size', 500))
+        self.parallelism = int(config.get('push_parallelism', config.get('concurrency', 64)))
+        
+        # Bounds the number of pushes in flight at once
+        self._sem = asyncio.Semaphore(self.parallelism)
+        
+        # Shared HTTP/2 client; concurrent pushes to one push service are multiplexed
+        # over a single connection, so TLS handshakes scale with origins, not subscriptions.
+        # Owners must close it: use "async with WebPushSender(...)" or call close().
+        self._client = httpx.AsyncClient(
+            http2=True,
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=256, max_keepalive_connections=128)
+        )
+        
+        # Signed VAPID headers by (push service origin, expiry bucket); stale buckets age out
+        self._signed_vapid_headers = functools.lru_cache(maxsize=1024)(self._sign_vapid_headers)
+        
+        # Check if we have valid VAPID keys; without them every send is skipped
+        self._disabled = not (self.vapid_private_key and self.vapid_public_key)
+        if self._disabled:
+            self._vapid = None
             self.logger.warning("VAPID keys not configured. Web push notifications will not work.")
+        else:
+            self._vapid = Vapid02.from_string(private_key=self.vapid_private_key)
     
     async def send_notification(self, notification: Notification) -> bool:
         """
@@ -51,6 +120,9 @@ class WebPushSender(NotificationSender):
         Returns:
             True if web push was sent successfully, False otherwise
         """
+        if self._disabled:
+            return False
+        
         try:
             # Get user's web push subscriptions
             subscription_query = select(WebPushSubscription).where(
@@ -64,58 +136,16 @@ class WebPushSender(NotificationSender):
                 self.logger.warning(f"User {notification.user_id} has no active web push subscriptions")
                 return False
             
-            # Prepare notification payload
-            payload = {
-                'title': f"AirAlert: {notification.alert.pollutant.upper()} Alert",
-                'body': notification.message,
-                'icon': '/icons/alert-icon-192.png',
-                'badge': '/icons/alert-badge-96.png',
-                'data': {
-                    'url': f"/alerts/{notification.alert_id}",
-                    'alert_id': notification.alert_id,
-                    'severity': notification.alert.severity_level,
-                    'pollutant': notification.alert.pollutant,
-                },
-                'vibrate': [100, 50, 100],  # Vibration pattern
-                'tag': f"airalert-{notification.alert.pollutant}-{notification.alert.severity_level}",
-                'actions': [
-                    {
-                        'action': 'view',
-                        'title': 'View Details'
-                    },
-                    {
-                        'action': 'dismiss',
-                        'title': 'Dismiss'
-                    }
-                ]
-            }
+            payload = self._build_payload(notification)
+            dead_sub_ids: Set[int] = set()
+            sent_ids = await self._send_by_origin(
+                [(notification, subscription, payload) for subscription in subscriptions],
+                dead_sub_ids
+            )
             
-            # Send to all of the user's subscriptions
-            success = False
-            for subscription in subscriptions:
-                try:
-                    # Convert subscription from database to the format required by pywebpush
-                    subscription_info = json.loads(subscription.subscription_json)
-                    
-                    # Send the notification (run in executor to avoid blocking)
-                    loop = asyncio.get_event_loop()
-                    await loop.run_in_executor(
-                        None,
-                        lambda: self._send_web_push(subscription_info, json.dumps(payload), subscription.id)
-                    )
-                    
-                    success = True  # At least one succeeded
-                except Exception as e:
-                    self.logger.error(f"Error sending web push to subscription {subscription.id}: {str(e)}")
-                    # If we get a subscription expired error, mark it as inactive
-                    if isinstance(e, WebPushException) and e.response and e.response.status_code in (404, 410):
-                        await self._deactivate_subscription(subscription.id)
+            await self._record_outcomes(list(sent_ids), dead_sub_ids)
             
-            if success:
-                # Update notification status
-                await self._update_notification_status(notification.id)
-                
-            return success
+            return notification.id in sent_ids
             
         except Exception as e:
             self.logger.error(f"Error sending web push notification: {str(e)}")
@@ -123,7 +153,7 @@ class WebPushSender(NotificationSender):
     
     async def send_batch(self, notifications: List[Notification]) -> Dict[int, bool]:
         """
-        Send a batch of web push notifications.
+        Send a batch of web push notifications, push_batch_size at a time.
         
         Args:
             notifications: List of notifications to send
@@ -131,80 +161,362 @@ class WebPushSender(NotificationSender):
         Returns:
             Dictionary mapping notification IDs to success/failure status
         """
+        if self._disabled:
+            return {notification.id: False for notification in notifications}
+        
         results = {}
+        for start in range(0, len(notifications), self.batch_size):
+            results.update(await self._send_chunk(notifications[start:start + self.batch_size]))
         
-        for notification in notifications:
-            results[notification.id] = await self.send_notification(notification)
-            
         return results
     
-    def _send_web_push(self, subscription_info: Dict, payload: str, subscription_id: int) -> bool:
+    async def _send_chunk(self, notifications: List[Notification]) -> Dict[int, bool]:
+        """
+        Send one chunk of web push notifications.
+        
+        Notifications (with their alerts) and the users' active subscriptions
+        are loaded with one query each, rather than per notification, and the
+        outcome is recorded with one commit.
+        
+        Args:
+            notifications: Notifications to send
+            
+        Returns:
+            Dictionary mapping notification IDs to success/failure status
+        """
+        notification_ids = [notification.id for notification in notifications]
+        user_ids = list({notification.user_id for notification in notifications})
+        
+        # Reload the notifications with their alerts in one query
+        notification_query = select(Notification).options(
+            joinedload(Notification.alert)
+        ).where(
+            Notification.id.in_(notification_ids)
+        )
+        notification_result = await self.db_session.execute(notification_query)
+        loaded = notification_result.scalars().unique().all()
+        
+        # Get every user's active subscriptions in one query
+        subscription_query = select(WebPushSubscription).where(
+            WebPushSubscription.user_id.in_(user_ids),
+            WebPushSubscription.is_active == True
+        )
+        subscription_result = await self.db_session.execute(subscription_query)
+        
+        subs_by_user: Dict[int, List[WebPushSubscription]] = defaultdict(list)
+        for subscription in subscription_result.scalars().all():
+            subs_by_user[subscription.user_id].append(subscription)
+        
+        # Serialize each distinct payload once; an alert's notifications usually share one
+        payloads: Dict[Tuple[int, str], bytes] = {}
+        for notification in loaded:
+            key = (notification.alert_id, notification.message)
+            if key not in payloads:
+                payloads[key] = self._build_payload(notification)
+        
+        # One (notification, subscription, payload) item per push to make
+        items: List[Tuple[Notification, WebPushSubscription, bytes]] = []
+        for notification in loaded:
+            subscriptions = subs_by_user.get(notification.user_id)
+            if not subscriptions:
+                self.logger.warning(f"User {notification.user_id} has no active web push subscriptions")
+                continue
+            
+            payload = payloads[(notification.alert_id, notification.message)]
+            items.extend((notification, subscription, payload) for subscription in subscriptions)
+        
+        dead_sub_ids: Set[int] = set()
+        sent_ids = await self._send_by_origin(items, dead_sub_ids)
+        
+        # Record every sent notification and expired subscription with one commit
+        await self._record_outcomes(list(sent_ids), dead_sub_ids)
+        
+        return {notification_id: notification_id in sent_ids for notification_id in notification_ids}
+    
+    async def _send_by_origin(
+        self,
+        items: List[Tuple[Notification, WebPushSubscription, bytes]],
+        dead_sub_ids: Set[int]
+    ) -> Set[int]:
+        """
+        Send pushes grouped by push service origin, all origins concurrently.
+        
+        Each origin's pushes share one VAPID header and are multiplexed over
+        the client's connection to that origin. Nothing is written to the
+        database here; the caller records the outcome, including subscriptions
+        added to dead_sub_ids.
+        
+        Args:
+            items: (notification, subscription, serialized payload) per push
+            dead_sub_ids: Set to add IDs of expired subscriptions to
+            
+        Returns:
+            IDs of the notifications that reached at least one subscription
+        """
+        by_origin: Dict[str, List[Tuple[Notification, WebPushSubscription, Dict[str, Any], bytes]]] = defaultdict(list)
+        for notification, subscription, payload in items:
+            try:
+                subscription_info = orjson.loads(subscription.subscription_json)
+                url = urlparse(subscription_info['endpoint'])
+            except Exception as e:
+                self.logger.error(f"Invalid web push subscription {subscription.id}: {str(e)}")
+                continue
+            
+            by_origin[f"{url.scheme}://{url.netloc}"].append(
+                (notification, subscription, subscription_info, payload)
+            )
+        
+        group_outcomes = await asyncio.gather(*(
+            self._send_origin_group(origin, group)
+            for origin, group in by_origin.items()
+        ), return_exceptions=True)
+        
+        sent_ids: Set[int] = set()
+        for (origin, group), outcomes in zip(by_origin.items(), group_outcomes):
+            if isinstance(outcomes, Exception):
+                self.logger.error(f"Error sending web pushes to {origin}: {str(outcomes)}")
+                continue
+            
+            for (notification, subscription, _, _), outcome in zip(group, outcomes):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Error sending web push to subscription {subscription.id}: {str(outcome)}")
+                    # If we get a subscription expired error, mark it as inactive
+                    if isinstance(outcome, WebPushError) and outcome.status in (404, 410):
+                        dead_sub_ids.add(subscription.id)
+                    continue
+                
+                sent_ids.add(notification.id)  # At least one succeeded
+        
+        return sent_ids
+    
+    async def _send_origin_group(
+        self,
+        origin: str,
+        group: List[Tuple[Notification, WebPushSubscription, Dict[str, Any], bytes]]
+    ) -> List[Any]:
         """
-        Send a web push notification using pywebpush.
+        Send every push bound for one push service origin.
         
         Args:
-            subscription_info: Push subscription information
-            payload: JSON string payload to send
+            origin: Push service origin (scheme and host)
+            group: (notification, subscription, parsed subscription, payload) per push
+            
+        Returns:
+            Response status code or exception for each push, in order
+        """
+        headers = {
+            **self._vapid_headers(origin),
+            'Content-Encoding': 'aes128gcm',
+            'Content-Type': 'application/octet-stream',
+            'TTL': str(self.ttl)
+        }
+        
+        return await asyncio.gather(*(
+            self._send_bounded(subscription_info, headers, payload, subscription.id)
+            for _, subscription, subscription_info, payload in group
+        ), return_exceptions=True)
+    
+    def _build_payload(self, notification: Notification) -> bytes:
+        """
+        Build the serialized push payload for a notification.
+        
+        Args:
+            notification: The notification to send, with its alert loaded
+            
+        Returns:
+            JSON payload bytes
+        """
+        payload = {
+            **self._PAYLOAD_TEMPLATE,
+            'title': f"AirAlert: {notification.alert.pollutant.upper()} Alert",
+            'body': notification.message,
+            'data': {
+                'url': f"/alerts/{notification.alert_id}",
+                'alert_id': notification.alert_id,
+                'severity': notification.alert.severity_level,
+                'pollutant': notification.alert.pollutant,
+            },
+            'tag': f"airalert-{notification.alert.pollutant}-{notification.alert.severity_level}",
+        }
+        
+        return orjson.dumps(payload)
+    
+    async def _send_bounded(
+        self,
+        subscription_info: Dict[str, Any],
+        headers: Dict[str, str],
+        payload: bytes,
+        subscription_id: int
+    ) -> int:
+        """
+        Encrypt and send one push once a concurrency slot is free.
+        
+        Args:
+            subscription_info: Parsed subscription (endpoint and keys)
+            headers: Request headers for the subscription's origin
+            payload: JSON payload to send
             subscription_id: ID of the subscription for logging
             
         Returns:
-            True if successful
+            HTTP status code of the push service response
         """
-        try:
-            response = webpush(
-                subscription_info=subscription_info,
-                data=payload,
-                vapid_private_key=self.vapid_private_key,
-                vapid_claims=self.vapid_claims
+        async with self._sem:
+            body = self._encrypt(payload, subscription_info['keys'])
+            return await self._send_web_push_async(
+                subscription_info['endpoint'], headers, body, subscription_id
             )
+    
+    async def close(self) -> None:
+        """Close the shared HTTP client."""
+        await self._client.aclose()
+    
+    async def __aenter__(self) -> "WebPushSender":
+        """Use the sender as an async context manager that closes its HTTP client on exit."""
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    def _vapid_headers(self, origin: str) -> Dict[str, str]:
+        """
+        Get the signed VAPID Authorization header for a push service origin.
+        
+        The JWT only depends on the origin and its expiry, so it is signed once
+        per origin per hour and reused for every endpoint there.
+        
+        Args:
+            origin: Push service origin (scheme and host)
+            
+        Returns:
+            Headers to add to the push request
+        """
+        if self._vapid is None:
+            raise WebPushError(0, "VAPID keys not configured")
+        
+        return self._signed_vapid_headers(origin, int(time.time() // 3600))
+    
+    def _sign_vapid_headers(self, origin: str, exp_bucket: int) -> Dict[str, str]:
+        """
+        Sign a VAPID JWT for a push service origin.
+        
+        Args:
+            origin: Push service origin (scheme and host)
+            exp_bucket: Hour the headers are used in, since the epoch
             
-            self.logger.info(f"Web push to subscription {subscription_id} response: {response.status_code}")
-            return response.status_code == 201
-        except WebPushException as e:
-            if e.response and e.response.status_code in (404, 410):
+        Returns:
+            Headers to add to the push request
+        """
+        claims = {
+            **self.vapid_claims,
+            'aud': origin,
+            'exp': (exp_bucket + 12) * 3600  # Within the 24 hour limit for every use in the bucket
+        }
+        return self._vapid.sign(claims)
+    
+    @staticmethod
+    def _encrypt(payload: bytes, keys: Dict[str, str]) -> bytes:
+        """
+        Encrypt a payload for a subscription (RFC 8291, aes128gcm).
+        
+        Args:
+            payload: Plaintext payload
+            keys: Subscription keys (p256dh and auth)
+            
+        Returns:
+            Encrypted request body
+        """
+        return http_ece.encrypt(
+            payload,
+            salt=os.urandom(16),
+            private_key=ec.generate_private_key(ec.SECP256R1()),
+            dh=_b64url_decode(keys['p256dh']),
+            auth_secret=_b64url_decode(keys['auth']),
+            version='aes128gcm'
+        )
+    
+    async def _send_web_push_async(
+        self,
+        endpoint: str,
+        headers: Dict[str, str],
+        body: bytes,
+        subscription_id: int
+    ) -> int:
+        """
+        POST an encrypted push to the subscription's push service.
+        
+        Args:
+            endpoint: Subscription endpoint URL
+            headers: Request headers, including VAPID authorization
+            body: Encrypted payload
+            subscription_id: ID of the subscription for logging
+            
+        Returns:
+            HTTP status code of the push service response
+        """
+        response = await self._client.post(endpoint, content=body, headers=headers)
+        self.logger.info(f"Web push to subscription {subscription_id} response: {response.status_code}")
+        
+        if response.status_code >= 400:
+            if response.status_code in (404, 410):
                 self.logger.warning(f"Subscription {subscription_id} no longer valid")
             else:
-                self.logger.error(f"Web Push failed: {e}", exc_info=True)
-            raise
-        except Exception as e:
-            self.logger.error(f"Error in _send_web_push: {str(e)}", exc_info=True)
-            raise
+                self.logger.error(f"Web Push failed: {response.status_code} {response.text}")
+            raise WebPushError(response.status_code, response.text)
+        
+        return response.status_code
     
-    async def _update_notification_status(self, notification_id: int) -> None:
+    async def _record_outcomes(self, sent_ids: List[int], dead_sub_ids: Set[int]) -> None:
         """
-        Update notification status after sending.
+        Record sent notifications and expired subscriptions with a single commit.
         
         Args:
-            notification_id: ID of the sent notification
+            sent_ids: IDs of the notifications that were sent
+            dead_sub_ids: IDs of the subscriptions the push service reported as gone
+        """
+        if not sent_ids and not dead_sub_ids:
+            return
+        
+        if sent_ids:
+            await self._update_notification_status(sent_ids)
+        if dead_sub_ids:
+            await self._deactivate_subscriptions(list(dead_sub_ids))
+        
+        await self.db_session.commit()
+    
+    async def _update_notification_status(self, notification_ids: List[int]) -> None:
+        """
+        Update notification status after sending, without committing.
+        
+        Args:
+            notification_ids: IDs of the sent notifications
         """
         now = datetime.now()
         
         stmt = update(Notification).where(
-            Notification.id == notification_id
+            Notification.id.in_(notification_ids)
         ).values(
             delivery_channel="web",
-            sent_at=now
+            sent_at=now,
+            status="sent"
         )
         
         await self.db_session.execute(stmt)
-        await self.db_session.commit()
     
-    async def _deactivate_subscription(self, subscription_id: int) -> None:
+    async def _deactivate_subscriptions(self, subscription_ids: List[int]) -> None:
         """
-        Mark a subscription as inactive.
+        Mark subscriptions as inactive, without committing.
         
         Args:
-            subscription_id: ID of the subscription to deactivate
+            subscription_ids: IDs of the subscriptions to deactivate
         """
         stmt = update(WebPushSubscription).where(
-            WebPushSubscription.id == subscription_id
+            WebPushSubscription.id.in_(subscription_ids)
         ).values(
             is_active=False,
             updated_at=datetime.now()
         )
         
         await self.db_session.execute(stmt)
-        await self.db_session.commit()
 
 
 async def send_web_push(user_id: int, title: str, message: str, icon: Optional[str] = None, url: Optional[str] = None) -> bool:
@@ -1,12 +1,28 @@
 import sqlite3
+from typing import Optional
 
-def populate_locations():
-    db_path = "/home/swayam/projects/AirAlert/airalert.db"
-    connection = sqlite3.connect(db_path)
-
-    # Enable SpatiaLite extension
+def init_spatialite(connection: sqlite3.Connection):
+    """Load the SpatiaLite extension into a connection."""
     connection.enable_load_extension(True)
     connection.execute("SELECT load_extension('mod_spatialite')")
+    connection.enable_load_extension(False)
+
+def populate_locations(connection: Optional[sqlite3.Connection] = None):
+    """
+    Set the location of each monitoring station.
+    
+    Args:
+        connection: Open connection with SpatiaLite loaded (optional). The
+            caller then owns the transaction; otherwise a connection is opened,
+            committed and closed here.
+    """
+    owns_connection = connection is None
+    if owns_connection:
+        db_path = "/home/swayam/projects/AirAlert/airalert.db"
+        connection = sqlite3.connect(db_path)
+
+        # Enable SpatiaLite extension
+        init_spatialite(connection)
 
     cursor = connection.cursor()
 
@@ -19,19 +35,18 @@ def populate_locations():
         (5, 12.9716, 77.5946),  # Station 5: Bangalore
     ]
 
-    for station_id, latitude, longitude in stations_data:
-        point_wkt = f"POINT({longitude} {latitude})"
-        cursor.execute(
-            """
-            UPDATE monitoring_stations
-            SET location = ST_GeomFromText(?, 4326)
-            WHERE id = ?
-            """,
-            (point_wkt, station_id),
-        )
-
-    connection.commit()
-    connection.close()
+    cursor.executemany(
+        """
+        UPDATE monitoring_stations
+        SET location = ST_GeomFromText(?, 4326)
+        WHERE id = ?
+        """,
+        [(f"POINT({longitude} {latitude})", station_id) for station_id, latitude, longitude in stations_data],
+    )
+
+    if owns_connection:
+        connection.commit()
+        connection.close()
 
 if __name__ == "__main__":
     populate_locations()
@@ -4,14 +4,34 @@ Script to populate AirAlert database with sample air quality data.
 This helps with testing and development by creating realistic data.
 """
 import sqlite3
-import random
 from datetime import datetime, timedelta
+from typing import Optional
 
-def generate_sample_data():
+import numpy as np
+import pandas as pd
+
+# PM2.5 breakpoints (μg/m³) and the AQI at each; AQI is linear between them
+PM25_BREAKPOINTS = np.array([0, 12, 35.4, 55.4, 150.4, 250.4, 500])
+AQI_BREAKPOINTS = np.array([0, 50, 100, 150, 200, 300, 500])
+
+def generate_sample_data(connection: Optional[sqlite3.Connection] = None):
+    """
+    Insert 48 hours of sample readings for each monitoring station.
+    
+    Args:
+        connection: Open connection to insert with (optional). The caller
+            then owns the transaction; otherwise a connection to airalert.db
+            is opened, committed and closed here.
+    """
     # Connect to the database
-    db_path = "airalert.db"
-    connection = sqlite3.connect(db_path)
-    cursor = connection.cursor()
+    owns_connection = connection is None
+    if owns_connection:
+        db_path = "airalert.db"
+        connection = sqlite3.connect(db_path)
+        
+        # Faster bulk writes: fewer fsyncs, and readers don't block the writer
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA journal_mode=WAL")
     
     print("Generating sample air quality data...")
     
@@ -41,112 +61,77 @@ def generate_sample_data():
         "pressure": (995, 1015),  # hPa
     }
     
+    n_stations = len(station_ids)
+    n_hours = 48
+    rng = np.random.default_rng()
+    
+    # Readings for the past 48 hours, oldest first
+    timestamps = [now - timedelta(hours=hours_ago) for hours_ago in range(n_hours, 0, -1)]
+    hours = np.array([timestamp.hour for timestamp in timestamps])
+    
+    def varied(value_range, delta):
+        """Per-station base values with some hourly variation, shape (stations, hours)."""
+        base = rng.uniform(value_range[0], value_range[1], n_stations)[:, None]
+        return base + rng.uniform(-delta, delta, (n_stations, n_hours))
+    
+    # Add some variation to base values to create trends
+    pm25 = np.maximum(0, varied(pollutant_ranges["pm25"], 5))
+    pm10 = np.maximum(0, varied(pollutant_ranges["pm10"], 10))
+    o3 = np.maximum(0, varied(pollutant_ranges["o3"], 5))
+    no2 = np.maximum(0, varied(pollutant_ranges["no2"], 7))
+    so2 = np.maximum(0, varied(pollutant_ranges["so2"], 3))
+    co = np.maximum(0, varied(pollutant_ranges["co"], 0.5))
+    
     # Calculate AQI based on PM2.5 (simplified formula)
-    def calculate_aqi(pm25):
-        if pm25 <= 12:
-            return (50/12) * pm25
-        elif pm25 <= 35.4:
-            return 50 + ((100-50)/(35.4-12)) * (pm25-12)
-        elif pm25 <= 55.4:
-            return 100 + ((150-100)/(55.4-35.4)) * (pm25-35.4)
-        elif pm25 <= 150.4:
-            return 150 + ((200-150)/(150.4-55.4)) * (pm25-55.4)
-        elif pm25 <= 250.4:
-            return 200 + ((300-200)/(250.4-150.4)) * (pm25-150.4)
-        else:
-            return 300 + ((500-300)/(500-250.4)) * (pm25-250.4)
-    
-    # Generate readings for each hour and station
-    readings = []
-    for station_id in station_ids:
-        # Base values for this station
-        base_values = {
-            "pm25": random.uniform(pollutant_ranges["pm25"][0], pollutant_ranges["pm25"][1]),
-            "pm10": random.uniform(pollutant_ranges["pm10"][0], pollutant_ranges["pm10"][1]),
-            "o3": random.uniform(pollutant_ranges["o3"][0], pollutant_ranges["o3"][1]),
-            "no2": random.uniform(pollutant_ranges["no2"][0], pollutant_ranges["no2"][1]),
-            "so2": random.uniform(pollutant_ranges["so2"][0], pollutant_ranges["so2"][1]),
-            "co": random.uniform(pollutant_ranges["co"][0], pollutant_ranges["co"][1]),
-            "temperature": random.uniform(weather_ranges["temperature"][0], weather_ranges["temperature"][1]),
-            "humidity": random.uniform(weather_ranges["humidity"][0], weather_ranges["humidity"][1]),
-            "wind_speed": random.uniform(weather_ranges["wind_speed"][0], weather_ranges["wind_speed"][1]),
-            "wind_direction": random.uniform(weather_ranges["wind_direction"][0], weather_ranges["wind_direction"][1]),
-            "pressure": random.uniform(weather_ranges["pressure"][0], weather_ranges["pressure"][1]),
-        }
-        
-        # Generate readings for the past 48 hours with some variation to create trends
-        for hours_ago in range(48, 0, -1):
-            timestamp = now - timedelta(hours=hours_ago)
-            
-            # Add some variation to base values
-            pm25 = max(0, base_values["pm25"] + random.uniform(-5, 5))
-            pm10 = max(0, base_values["pm10"] + random.uniform(-10, 10))
-            o3 = max(0, base_values["o3"] + random.uniform(-5, 5))
-            no2 = max(0, base_values["no2"] + random.uniform(-7, 7))
-            so2 = max(0, base_values["so2"] + random.uniform(-3, 3))
-            co = max(0, base_values["co"] + random.uniform(-0.5, 0.5))
-            
-            # Calculate AQI
-            aqi = calculate_aqi(pm25)
-            
-            # Weather data
-            temperature = base_values["temperature"] + random.uniform(-2, 2)
-            humidity = max(0, min(100, base_values["humidity"] + random.uniform(-5, 5)))
-            wind_speed = max(0, base_values["wind_speed"] + random.uniform(-2, 2))
-            wind_direction = (base_values["wind_direction"] + random.uniform(-20, 20)) % 360
-            pressure = base_values["pressure"] + random.uniform(-1, 1)
-            
-            # Add daily trends
-            hour = timestamp.hour
-            if 6 <= hour <= 9:  # Morning rush hour
-                pm25 *= 1.2
-                pm10 *= 1.2
-                no2 *= 1.3
-            elif 17 <= hour <= 20:  # Evening rush hour
-                pm25 *= 1.25
-                pm10 *= 1.25
-                no2 *= 1.35
-            elif 0 <= hour <= 4:  # Night time
-                pm25 *= 0.8
-                pm10 *= 0.8
-                no2 *= 0.7
-            
-            reading = {
-                "station_id": station_id,
-                "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                "pm25": round(pm25, 2),
-                "pm10": round(pm10, 2),
-                "o3": round(o3, 2),
-                "no2": round(no2, 2),
-                "so2": round(so2, 2),
-                "co": round(co, 2),
-                "aqi": round(aqi, 1),
-                "temperature": round(temperature, 1),
-                "humidity": round(humidity, 1),
-                "wind_speed": round(wind_speed, 1),
-                "wind_direction": round(wind_direction, 1),
-                "pressure": round(pressure, 1),
-            }
-            
-            readings.append(reading)
-    
-    # Insert readings into the database
+    aqi = np.interp(pm25, PM25_BREAKPOINTS, AQI_BREAKPOINTS)
+    
+    # Weather data
+    temperature = varied(weather_ranges["temperature"], 2)
+    humidity = np.clip(varied(weather_ranges["humidity"], 5), 0, 100)
+    wind_speed = np.maximum(0, varied(weather_ranges["wind_speed"], 2))
+    wind_direction = varied(weather_ranges["wind_direction"], 20) % 360
+    pressure = varied(weather_ranges["pressure"], 1)
+    
+    # Add daily trends: morning rush hour, evening rush hour, night time
+    trend_periods = [(6 <= hours) & (hours <= 9), (17 <= hours) & (hours <= 20), hours <= 4]
+    pm_trend = np.select(trend_periods, [1.2, 1.25, 0.8], default=1.0)
+    no2_trend = np.select(trend_periods, [1.3, 1.35, 0.7], default=1.0)
+    pm25 = pm25 * pm_trend
+    pm10 = pm10 * pm_trend
+    no2 = no2 * no2_trend
+    
+    # One row per (station, hour), station by station
+    timestamp_strings = [timestamp.strftime("%Y-%m-%d %H:%M:%S") for timestamp in timestamps]
+    readings = pd.DataFrame({
+        "station_id": np.repeat(station_ids, n_hours),
+        "timestamp": timestamp_strings * n_stations,
+        "pm25": np.round(pm25, 2).ravel(),
+        "pm10": np.round(pm10, 2).ravel(),
+        "o3": np.round(o3, 2).ravel(),
+        "no2": np.round(no2, 2).ravel(),
+        "so2": np.round(so2, 2).ravel(),
+        "co": np.round(co, 2).ravel(),
+        "aqi": np.round(aqi, 1).ravel(),
+        "temperature": np.round(temperature, 1).ravel(),
+        "humidity": np.round(humidity, 1).ravel(),
+        "wind_speed": np.round(wind_speed, 1).ravel(),
+        "wind_direction": np.round(wind_direction, 1).ravel(),
+        "pressure": np.round(pressure, 1).ravel(),
+    })
+    
+    # Insert readings with one prepared statement; unlike DataFrame.to_sql this
+    # doesn't commit, so a caller's transaction stays open
     print(f"Inserting {len(readings)} readings into the database...")
-    for reading in readings:
-        cursor.execute("""
-            INSERT INTO pollutant_readings (
-                station_id, timestamp, pm25, pm10, o3, no2, so2, co, aqi,
-                temperature, humidity, wind_speed, wind_direction, pressure
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            reading["station_id"], reading["timestamp"], 
-            reading["pm25"], reading["pm10"], reading["o3"], reading["no2"], reading["so2"], reading["co"], reading["aqi"],
-            reading["temperature"], reading["humidity"], reading["wind_speed"], reading["wind_direction"], reading["pressure"]
-        ))
-    
-    # Commit and close
-    connection.commit()
-    connection.close()
+    columns = ", ".join(readings.columns)
+    placeholders = ", ".join("?" * len(readings.columns))
+    connection.executemany(
+        f"INSERT INTO pollutant_readings ({columns}) VALUES ({placeholders})",
+        readings.itertuples(index=False, name=None)
+    )
+    
+    if owns_connection:
+        connection.commit()
+        connection.close()
     
     print(f"Successfully added {len(readings)} sample readings to the database.")
 
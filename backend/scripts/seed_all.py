@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Script to seed a development AirAlert database in one pass.
+Sets station locations and inserts sample readings over a single connection
+and a single transaction.
+
+Usage: python backend/scripts/seed_all.py [path/to/airalert.db]
+"""
+import sys
+import sqlite3
+
+from populate_locations import init_spatialite, populate_locations
+from populate_sample_data import generate_sample_data
+
+def seed_all(db_path: str = "airalert.db"):
+    """
+    Set station locations and insert sample readings in one transaction.
+    
+    Args:
+        db_path: Path to the SQLite database to seed
+    """
+    connection = sqlite3.connect(db_path)
+    
+    # Faster bulk writes; these must be set before the transaction starts
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    connection.execute("PRAGMA cache_size=-65536")  # 64 MiB
+    
+    init_spatialite(connection)
+    
+    try:
+        # Commits once on success, rolls back everything on failure
+        with connection:
+            connection.execute("BEGIN")
+            populate_locations(connection)
+            generate_sample_data(connection)
+    finally:
+        connection.close()
+    
+    print(f"Seeded {db_path} successfully.")
+
+if __name__ == "__main__":
+    seed_all(sys.argv[1] if len(sys.argv) > 1 else "airalert.db")
@@ -1,17 +1,17 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables the same way the app does
+from backend.config import load_environment, resolved_database_url
+load_environment()
 
 # Print raw DATABASE_URL
 raw_url = os.environ.get("DATABASE_URL")
 print(f"Raw DATABASE_URL from env: {repr(raw_url)}")
 
-# Try to decode if necessary
-if "\\x" in raw_url:
-    try:
-        decoded_url = bytes(raw_url, 'utf-8').decode('unicode_escape')
+# Show the decoded URL the app will use, if decoding changes it
+try:
+    decoded_url = resolved_database_url()
+    if decoded_url != raw_url:
         print(f"Decoded URL: {repr(decoded_url)}")
-    except Exception as e:
-        print(f"Error decoding: {e}")
+except Exception as e:
+    print(f"Error decoding: {e}")
@@ -12,31 +12,32 @@ async def register_user(
     Register a new user.
     """
     try:
-        # Check if username already exists - handle asynchronous execution correctly
-        query = select(User).where(User.username == user_data.username)
+        # Check whether the username or email is taken, in one query that only
+        # fetches the two columns needed to tell which one clashed
+        conditions = [User.username == user_data.username]
+        if user_data.email:
+            conditions.append(User.email == user_data.email)
+        
+        query = select(User.username, User.email).where(or_(*conditions))
         result = await db.execute(query)
-        existing_user = result.first()  # Use .first() instead of .scalar_one_or_none()
+        existing = result.all()
         
-        if existing_user:
+        if any(row.username == user_data.username for row in existing):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already registered"
             )
         
-        # Check if email already exists if provided
-        if user_data.email:
-            query = select(User).where(User.email == user_data.email)
-            result = await db.execute(query)
-            existing_email = result.first()
-            
-            if existing_email:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already registered"
-                )
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+        
+        # Hash the password off the event loop; bcrypt is slow by design
+        hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
         
-        # Hash the password
-        hashed_password = get_password_hash(user_data.password)
+        now = datetime.now(timezone.utc)
         
         # Create new user
         new_user = User(
@@ -45,8 +46,8 @@ async def register_user(
             name=user_data.name,
             phone=user_data.phone,
             hashed_password=hashed_password,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
+            created_at=now,
+            updated_at=now,
             is_verified=False,
             failed_login_attempts=0,
             role="user"
@@ -60,8 +61,8 @@ async def register_user(
         
         # Save user to database
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         # Send verification email in background if email provided
         if user_data.email and new_user.verification_token:
@@ -5,11 +5,8 @@ Consolidated from both original main.py and run_fixed.py.
 """
 import os
 import logging
-import asyncio
 import uvicorn
 import warnings
-from dotenv import load_dotenv
-import pathlib
 
 # Filter out specific Pydantic warning about orm_mode
 warnings.filterwarnings("ignore", message="Valid config keys have changed in V2.*'orm_mode' has been renamed.*")
@@ -23,14 +20,10 @@ logger = logging.getLogger("airalert")
 # Set SQLAlchemy logging to info level
 logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
 
-# Try to load environment variables from .env.fixed first, fall back to .env
-env_fixed_path = pathlib.Path(".env.fixed")
-if env_fixed_path.exists():
-    logger.info("Loading environment from .env.fixed")
-    load_dotenv(dotenv_path=".env.fixed")
-else:
-    logger.info("Loading environment from .env")
-    load_dotenv()
+# Load environment variables once, without overriding ones already set; the
+# backend modules imported below reuse this load instead of reading the file again
+from backend.config import load_environment, resolved_database_url
+logger.info(f"Loaded environment from {load_environment()}")
 
 # Ensure DATABASE_URL is set
 if not os.environ.get("DATABASE_URL"):
@@ -44,9 +37,10 @@ HOST = os.getenv("HOST", "0.0.0.0")
 # Import API app
 from backend.api.app import app
 
-if __name__ == "__main__":
+def main():
+    """Start the development server."""
     logger.info(f"Starting AirAlert on {HOST}:{PORT}")
-    logger.info(f"Using database: {os.environ.get('DATABASE_URL')}")
+    logger.info(f"Using database: {resolved_database_url()}")
     uvicorn.run(
         "main:app",
         host=HOST,
@@ -54,3 +48,6 @@ if __name__ == "__main__":
         reload=True,
         log_level="info"
     )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""add_pending_notifications_index
+
+Revision ID: 3f9d2b7c41a0
+Revises: c5c1598f9202
+Create Date: 2026-10-16 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9d2b7c41a0'
+down_revision: Union[str, None] = 'c5c1598f9202'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add a partial index over unsent notifications"""
+    op.create_index(
+        'ix_notifications_pending',
+        'notifications',
+        ['user_id', 'id'],
+        postgresql_where=sa.text('sent_at IS NULL'),
+        sqlite_where=sa.text('sent_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    """Remove the pending notifications index"""
+    op.drop_index('ix_notifications_pending', table_name='notifications')
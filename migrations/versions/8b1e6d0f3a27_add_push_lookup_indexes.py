@@ -0,0 +1,48 @@
+"""add_push_lookup_indexes
+
+Revision ID: 8b1e6d0f3a27
+Revises: 3f9d2b7c41a0
+Create Date: 2026-10-16 14:03:27.904615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e6d0f3a27'
+down_revision: Union[str, None] = '3f9d2b7c41a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add indexes for the per-alert pending notification and active push subscription lookups"""
+    op.create_index(
+        'idx_notifications_alert_pending',
+        'notifications',
+        ['alert_id', 'user_id'],
+        postgresql_where=sa.text('sent_at IS NULL'),
+        sqlite_where=sa.text('sent_at IS NULL')
+    )
+    
+    # web_push_subscriptions is created by the application (create_all), not by a
+    # migration, and create_all also creates this index if the table is new
+    if sa.inspect(op.get_bind()).has_table('web_push_subscriptions'):
+        op.create_index(
+            'idx_wps_user_active',
+            'web_push_subscriptions',
+            ['user_id', 'is_active'],
+            postgresql_where=sa.text('is_active'),
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Remove the push lookup indexes"""
+    if sa.inspect(op.get_bind()).has_table('web_push_subscriptions'):
+        op.drop_index('idx_wps_user_active', table_name='web_push_subscriptions', if_exists=True)
+    
+    op.drop_index('idx_notifications_alert_pending', table_name='notifications')
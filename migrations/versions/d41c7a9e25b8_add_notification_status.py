@@ -0,0 +1,63 @@
+"""add_notification_status
+
+Revision ID: d41c7a9e25b8
+Revises: 8b1e6d0f3a27
+Create Date: 2026-10-16 16:21:08.337140
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7a9e25b8'
+down_revision: Union[str, None] = '8b1e6d0f3a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING = "sent_at IS NULL AND status = 'pending'"
+UNSENT = 'sent_at IS NULL'
+
+
+def _create_pending_indexes(where: str) -> None:
+    """Create the partial indexes the dispatcher polls, restricted by the given predicate"""
+    op.create_index(
+        'ix_notifications_pending',
+        'notifications',
+        ['user_id', 'id'],
+        postgresql_where=sa.text(where),
+        sqlite_where=sa.text(where)
+    )
+    op.create_index(
+        'idx_notifications_alert_pending',
+        'notifications',
+        ['alert_id', 'user_id'],
+        postgresql_where=sa.text(where),
+        sqlite_where=sa.text(where)
+    )
+
+
+def _drop_pending_indexes() -> None:
+    """Drop the partial indexes the dispatcher polls"""
+    op.drop_index('idx_notifications_alert_pending', table_name='notifications')
+    op.drop_index('ix_notifications_pending', table_name='notifications')
+
+
+def upgrade() -> None:
+    """Add a dispatch status to notifications and restrict the pending indexes to pending rows"""
+    op.add_column('notifications', sa.Column('status', sa.String(), server_default='pending', nullable=False))
+    op.execute("UPDATE notifications SET status = 'sent' WHERE sent_at IS NOT NULL")
+    
+    # Suppressed rows keep sent_at unset, so the indexes must exclude them by status
+    _drop_pending_indexes()
+    _create_pending_indexes(PENDING)
+
+
+def downgrade() -> None:
+    """Remove the notification status column"""
+    _drop_pending_indexes()
+    _create_pending_indexes(UNSENT)
+    
+    op.drop_column('notifications', 'status')
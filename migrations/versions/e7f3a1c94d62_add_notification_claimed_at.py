@@ -0,0 +1,36 @@
+"""add_notification_claimed_at
+
+Revision ID: e7f3a1c94d62
+Revises: d41c7a9e25b8
+Create Date: 2026-10-16 18:47:52.106394
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f3a1c94d62'
+down_revision: Union[str, None] = 'd41c7a9e25b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Record when a notification was claimed for delivery, and index the claimed rows"""
+    op.add_column('notifications', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_notifications_claimed',
+        'notifications',
+        ['claimed_at'],
+        postgresql_where=sa.text("status = 'sending'"),
+        sqlite_where=sa.text("status = 'sending'")
+    )
+
+
+def downgrade() -> None:
+    """Remove the notification claim timestamp"""
+    op.drop_index('ix_notifications_claimed', table_name='notifications')
+    op.drop_column('notifications', 'claimed_at')
@@ -0,0 +1,140 @@
+"""
+Tests for the notification manager's pre-dispatch filtering.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.notifications import manager as manager_module
+from backend.notifications.manager import NotificationManager, NotificationPreferences, shutdown_notifications
+
+
+def make_notification(
+    notif_id: int,
+    user_id: int,
+    alert_id: int,
+    channel: str = "pending",
+    severity: int = 3,
+    alert_type: str = "pollution"
+):
+    """Build a stand-in for a hydrated Notification row and its alert."""
+    alert = SimpleNamespace(id=alert_id, severity_level=severity, alert_type=alert_type)
+    return SimpleNamespace(id=notif_id, user_id=user_id, alert_id=alert_id, delivery_channel=channel, alert=alert)
+
+
+def test_drop_duplicates_keeps_first_notification_per_alert():
+    """Repeat rows for the same user and alert are dropped; other users and alerts are kept."""
+    by_user = {
+        1: [
+            make_notification(10, 1, 100, "email"),
+            make_notification(11, 1, 100, "sms"),
+            make_notification(12, 1, 101),
+            make_notification(13, 1, 100, "app"),
+        ],
+        2: [make_notification(20, 2, 100)],
+    }
+    
+    dropped = NotificationManager._drop_duplicates(by_user)
+    
+    assert dropped == [11, 13]
+    assert [notif.id for notif in by_user[1]] == [10, 12]
+    assert [notif.id for notif in by_user[2]] == [20]
+    # The kept row's intended channel is untouched
+    assert by_user[1][0].delivery_channel == "email"
+
+
+def test_drop_duplicates_without_duplicates_is_a_no_op():
+    """Nothing is dropped when every notification is for a different alert."""
+    by_user = {1: [make_notification(10, 1, 100), make_notification(11, 1, 101)]}
+    
+    assert NotificationManager._drop_duplicates(by_user) == []
+    assert [notif.id for notif in by_user[1]] == [10, 11]
+
+
+def test_drop_below_severity_uses_each_users_minimum():
+    """Alerts below a user's minimum severity are dropped for that user only."""
+    manager = NotificationManager()
+    manager._preferences_cache[1] = NotificationPreferences(minimum_severity=3)
+    manager._preferences_cache[2] = NotificationPreferences(minimum_severity=1)
+    by_user = {
+        1: [make_notification(10, 1, 100, severity=2), make_notification(11, 1, 101, severity=3)],
+        2: [make_notification(20, 2, 100, severity=2)],
+    }
+    
+    dropped = manager._drop_below_severity(by_user)
+    
+    assert dropped == [10]
+    assert [notif.id for notif in by_user[1]] == [11]
+    assert [notif.id for notif in by_user[2]] == [20]
+
+
+def test_drop_below_severity_always_delivers_admin_broadcasts():
+    """Admin broadcasts are kept whatever their severity."""
+    manager = NotificationManager()
+    manager._preferences_cache[1] = NotificationPreferences(minimum_severity=5)
+    by_user = {1: [make_notification(10, 1, 100, severity=0, alert_type="admin_broadcast")]}
+    
+    assert manager._drop_below_severity(by_user) == []
+    assert [notif.id for notif in by_user[1]] == [10]
+
+
+def test_drop_below_severity_skips_users_without_preferences():
+    """Users whose preferences weren't loaded are left for _channels_for to handle."""
+    manager = NotificationManager()
+    by_user = {1: [make_notification(10, 1, 100, severity=1)]}
+    
+    assert manager._drop_below_severity(by_user) == []
+    assert [notif.id for notif in by_user[1]] == [10]
+
+
+@pytest.mark.asyncio
+async def test_alerts_from_separate_managers_share_one_dispatch(monkeypatch):
+    """Alerts requested within the debounce window are dispatched together, even across managers."""
+    dispatched = []
+    dispatchers = []
+    
+    async def fake_dispatch_alerts(self, alert_ids):
+        dispatched.append(set(alert_ids))
+        dispatchers.append(self)
+        return set(alert_ids), {"alert_ids": sorted(alert_ids), "total": 1, "email": 1, "sms": 0, "web": 0, "failed": 0}
+    
+    monkeypatch.setattr(NotificationManager, "_dispatch_alerts", fake_dispatch_alerts)
+    
+    # One manager per alert, as process_notifications_task builds them
+    managers = [
+        NotificationManager(SimpleNamespace(bind=None), {"alert_debounce_ms": 50})
+        for _ in range(2)
+    ]
+    
+    first, second = await asyncio.gather(
+        managers[0].send_alert_notifications(1),
+        managers[1].send_alert_notifications(2)
+    )
+    
+    assert dispatched == [{1, 2}]
+    # The flush runs on the long-lived manager, not on either caller's
+    assert dispatchers == [managers[0]._shared_manager()]
+    assert dispatchers[0] not in managers
+    assert first["alert_id"] == 1 and second["alert_id"] == 2
+    assert first["alert_ids"] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_shutdown_waits_for_background_deliveries():
+    """shutdown_notifications lets in-flight deliveries finish and forgets the loop's managers."""
+    delivered = []
+    
+    async def deliver():
+        await asyncio.sleep(0.01)
+        delivered.append(True)
+    
+    shared = NotificationManager(SimpleNamespace(bind=None), {})._shared_manager()
+    task = asyncio.create_task(deliver())
+    shared._inflight.add(task)
+    task.add_done_callback(shared._inflight.discard)
+    
+    await shutdown_notifications()
+    
+    assert delivered == [True]
+    assert asyncio.get_running_loop() not in manager_module._shared_managers
@@ -0,0 +1,66 @@
+"""
+Tests for how the notification senders record delivered notifications.
+"""
+import pytest
+
+from backend.notifications.email import EmailSender
+from backend.notifications.web_push import WebPushSender
+
+
+class RecordingSession:
+    """Stand-in for an AsyncSession that keeps the statements it is given."""
+    
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+    
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+    
+    async def commit(self):
+        self.commits += 1
+
+
+def sent_values(session: RecordingSession) -> dict:
+    """Values written by the single UPDATE a sender issued."""
+    assert len(session.statements) == 1
+    return session.statements[0].compile().params
+
+
+@pytest.mark.asyncio
+async def test_email_sender_marks_batch_sent():
+    """Delivered emails get their channel, sent_at and a 'sent' status."""
+    session = RecordingSession()
+    sender = EmailSender({}, session)
+    
+    await sender._update_notification_status([1, 2])
+    
+    values = sent_values(session)
+    assert values["status"] == "sent"
+    assert values["delivery_channel"] == "email"
+    assert values["sent_at"] is not None
+    assert session.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_web_push_sender_marks_batch_sent():
+    """Delivered pushes get their channel, sent_at and a 'sent' status."""
+    session = RecordingSession()
+    
+    async with WebPushSender({}, session) as sender:
+        await sender._record_outcomes([1, 2], set())
+    
+    values = sent_values(session)
+    assert values["status"] == "sent"
+    assert values["delivery_channel"] == "web"
+    assert values["sent_at"] is not None
+    assert session.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_web_push_sender_closes_its_client():
+    """Leaving the sender's context closes its HTTP client."""
+    async with WebPushSender({}, RecordingSession()) as sender:
+        pass
+    
+    assert sender._client.is_closed
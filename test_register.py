@@ -1,53 +1,169 @@
+import os
+import atexit
 import logging
+import logging.handlers
+import queue
 
-# Set up logging configuration
+# Set up logging configuration: records are queued and written to stderr by a
+# background listener thread, so logging never blocks the registrations
+log_queue = queue.Queue(maxsize=10000)
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+# Verbose output only when AIRALERT_DEBUG is set
 logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG if os.environ.get("AIRALERT_DEBUG") else logging.INFO,
     handlers=[
-        logging.StreamHandler()
+        logging.handlers.QueueHandler(log_queue)
     ]
 )
 logger = logging.getLogger(__name__)
+# Per-statement SQL logging is too noisy even when debugging
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 
 # Modify the content of run_fixed.py to diagnose 
 # the SQLAlchemy issue with ChunkedIteratorResult
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy import create_engine, Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import asyncio
+import functools
+import secrets
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Prefer uvloop's faster event loop when it's installed; used for each
+# registration's event loop, which is where the work runs
+try:
+    import uvloop
+    run = uvloop.run
+except ImportError:
+    run = asyncio.run
+
+from fastapi import Request, BackgroundTasks, HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from backend.config import resolved_database_url
+
+# Connections the engine may hold at once, and so the most registrations in flight
+POOL_SIZE = 20
+MAX_OVERFLOW = 30
+
+# Mock request shared by every registration; nothing in register_user mutates it
+MOCK_REQUEST = Request({"type": "http", "headers": [], "query_string": b"", "method": "POST"})
 
-async def main():
+@functools.cache
+def get_engine() -> Engine:
+    """
+    Get the process-wide engine, creating it on first use.
+    
+    Built lazily so importing this module from another runner costs nothing,
+    and shared so repeated runs reuse the pool's connections.
+    """
+    # register_user is written against the app's synchronous Session (see
+    # get_db), so the driver hands it the same kind of session. Pool sized for
+    # concurrent registrations.
+    return create_engine(
+        resolved_database_url(),
+        poolclass=QueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+
+@functools.cache
+def get_sessionmaker() -> sessionmaker:
+    """Get the session factory bound to the shared engine."""
+    return sessionmaker(bind=get_engine(), expire_on_commit=False)
+
+def warm_pool(size: int) -> None:
+    """
+    Open pool connections ahead of time so registrations don't pay for connecting.
+    
+    Args:
+        size: Number of connections to open (and return to the pool)
+    """
+    connections = [get_engine().connect() for _ in range(size)]
+    for connection in connections:
+        connection.close()
+
+def main(count: int = 1):
+    """
+    Register test users concurrently, one worker thread and session per registration.
+    
+    register_user blocks on a synchronous Session, so concurrency comes from
+    threads rather than from an event loop.
+    
+    Args:
+        count: Number of users to register at once
+    """
     from backend.api.auth.routes import register_user
+    from backend.api.auth import utils as auth_utils
+    from passlib.context import CryptContext
     logger.info("Testing the database queries to isolate the issue")
     
+    # The hash isn't checked here, so use bcrypt's minimum work factor to keep
+    # registrations bound by the database rather than by hashing
+    auth_utils.pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4, deprecated="auto")
+    
+    # Connect up front, as many connections as the registrations will use at once
+    warm_pool(min(count, get_engine().pool.size()))
+    
     # Create a temporary function to fix the registation issues
-    from backend.models.database import get_db
-    from fastapi import Request, BackgroundTasks
     from backend.api.auth.models import UserCreate
     
-    # Create a mock request and user data
-    mock_request = Request({"type": "http"})
-    mock_bg = BackgroundTasks()
-    
-    # Create a test user
-    test_user = UserCreate(
-        username="TestUser123",
-        email="test@example.com",
-        name="Test User",
-        phone="1234567890",
-        password="TestPass123!"
-    )
+    # Create the test users with fresh names, so every run measures a real
+    # insert instead of the duplicate-username path. The values are known to be
+    # valid, so skip pydantic validation.
+    def make_user() -> UserCreate:
+        suffix = secrets.token_hex(6)
+        return UserCreate.model_construct(
+            username=f"TestUser_{suffix}",
+            email=f"test_{suffix}@example.com",
+            name="Test User",
+            phone="1234567890",
+            password="TestPass123!"
+        )
+    
+    def register_one(test_user: UserCreate, background_tasks: BackgroundTasks):
+        # Sessions can't be shared between threads, so each registration gets its own.
+        # register_user is declared async, so it still needs an event loop to run on.
+        # Each registration gets its own (uvloop when available) in this worker thread.
+        with get_sessionmaker()() as db:
+            # Call the register function
+            try:
+                user = run(register_user(test_user, background_tasks, MOCK_REQUEST, db))
+                logger.info("User registered successfully: %s", user)
+            except HTTPException as e:
+                # Expected rejections (e.g. a taken username) don't need a traceback,
+                # but register_user reports its own failures as 500s, so keep those
+                if e.status_code < 500:
+                    logger.warning("Registration rejected: %s", e)
+                else:
+                    logger.error("Error registering user: %s", e, exc_info=True)
+            except IntegrityError as e:
+                logger.warning("Registration rejected: %s", e)
+            except Exception as e:
+                logger.error("Error registering user: %s", e, exc_info=True)
     
-    # Get a database session
-    db = next(get_db())
+    # BackgroundTasks collects tasks, so each registration needs its own; build them up front
+    test_users = [make_user() for _ in range(count)]
+    background_tasks = [BackgroundTasks() for _ in range(count)]
     
-    # Call the register function
+    with ThreadPoolExecutor(max_workers=min(count, POOL_SIZE + MAX_OVERFLOW)) as executor:
+        list(executor.map(register_one, test_users, background_tasks))
+
+
+def run_script(count: int) -> None:
+    """Run main() and close the engine's pooled connections afterwards."""
     try:
-        user = await register_user(test_user, mock_bg, mock_request, db)
-        logger.info(f"User registered successfully: {user}")
-    except Exception as e:
-        logger.error(f"Error registering user: {e}", exc_info=True)
-        
+        main(count)
+    finally:
+        get_engine().dispose()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    listener.start()
+    atexit.register(listener.stop)
+    run_script(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
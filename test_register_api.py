@@ -0,0 +1,64 @@
+"""
+Test user registration through the ASGI app, against a temporary database.
+"""
+import secrets
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.api.app import app
+from backend.models.database import Base, get_db
+
+
+@pytest.fixture
+def test_db(tmp_path):
+    """Point get_db at a fresh SQLite database for the duration of a test."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'airalert_test.db'}")
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+    
+    def override_get_db():
+        session = TestingSessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def async_client(test_db):
+    """
+    HTTP client for the real ASGI app.
+    
+    The app's startup handlers aren't run (they create tables in the configured
+    database); test_db has already created them in the temporary one.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_register(async_client):
+    """Register a user through the API, with FastAPI's own dependencies and middleware."""
+    suffix = secrets.token_hex(6)
+    response = await async_client.post("/api/auth/register", json={
+        "username": f"TestUser_{suffix}",
+        "email": f"test_{suffix}@example.com",
+        "name": "Test User",
+        "phone": "1234567890",
+        "password": "TestPass123!"
+    })
+    
+    assert response.status_code == 201, response.text
+    assert response.json()["username"] == f"TestUser_{suffix}"